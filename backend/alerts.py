@@ -0,0 +1,241 @@
+import queue
+import threading
+import time
+from email.mime.text import MIMEText
+
+
+class Alert:
+    def __init__(self, key, subject, body):
+        self.key = key
+        self.subject = subject
+        self.body = body
+        self.created = time.time()
+
+
+class AlertDispatcher:
+    # Sends alert emails from a background worker so a slow or unreachable
+    # mail server never stalls the caller.
+    #
+    # - Alerts with the same key (usually the metric) are sent at most once
+    #   per cooldown window; resolve(key) re-arms a key early once the
+    #   condition clears.
+    # - Alerts raised within `digest_seconds` of each other go out as one
+    #   digest email.
+    # - The authenticated SMTP session is kept open and reused, and closed
+    #   after `idle_seconds` without mail.
+    # - After a failed send, nothing is tried for retry_base seconds,
+    #   doubling after every further failure up to retry_max. Alerts raised
+    #   meanwhile are held (newest per key) and go out with the next
+    #   attempt. Changing the mail settings ends the wait. A failure is
+    #   logged once, not on every attempt.
+    #
+    # get_settings() returns the "Email Settings" dict and is called for each
+    # batch, so credential edits apply without a restart.
+
+    def __init__(self, get_settings, cooldown=3600, digest_seconds=5, idle_seconds=300, timeout=30,
+                 retry_base=60, retry_max=3600):
+        self.get_settings = get_settings
+        self.cooldown = cooldown
+        self.digest_seconds = digest_seconds
+        self.idle_seconds = idle_seconds
+        self.timeout = timeout
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._queue = queue.Queue()
+        self._last_sent = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._server_key = None
+        self.sent = 0
+        self.suppressed = 0
+        self.failed = 0
+        self.last_error = None
+        self._failures = 0  # Consecutive failed sends
+        self._retry_at = 0.0
+        self._failed_key = None  # Server settings of the last failed send
+        self._thread = None
+
+    def send(self, key, subject, body):
+        # Queue an alert; returns False if it was suppressed by the cooldown
+        with self._lock:
+            last = self._last_sent.get(key)
+            if last is not None and time.time() - last < self.cooldown:
+                self.suppressed += 1
+                return False
+        self._queue.put(Alert(key, subject, body))
+        return True
+
+    def resolve(self, key):
+        with self._lock:
+            self._last_sent.pop(key, None)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="alerts", daemon=True)
+            self._thread.start()
+
+    def info(self):
+        with self._lock:
+            return {
+                "sent": self.sent,
+                "suppressed": self.suppressed,
+                "failed": self.failed,
+                "queued": self._queue.qsize(),
+                "connected": self._server is not None,
+                "last_error": self.last_error,
+                "retry_at": self._retry_at if self._failures else None,
+                "cooling_down": sorted(key for key, at in self._last_sent.items() if time.time() - at < self.cooldown)
+            }
+
+    def _run(self):
+        pending = {}  # key -> newest alert not delivered yet
+        while True:
+            wait = max(0.0, self._retry_at - time.time()) if pending else self.idle_seconds
+            try:
+                first = self._queue.get(timeout=wait)
+            except queue.Empty:
+                if not pending:
+                    self._disconnect()
+                    continue
+            else:
+                pending[first.key] = first
+                self._collect(pending)
+            if self._backing_off():
+                continue
+            batch = self._due(pending)
+            if batch and not self._deliver(batch):
+                continue
+            pending.clear()
+
+    def _backing_off(self):
+        if not self._failures or time.time() >= self._retry_at:
+            return False
+        return self._settings_key(self.get_settings() or {}) == self._failed_key
+
+    def _collect(self, pending):
+        # Gather everything raised within the digest window, keeping only the
+        # newest alert per key
+        deadline = time.time() + self.digest_seconds
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                alert = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending[alert.key] = alert
+
+    def _due(self, pending):
+        # Drops the keys that went out meanwhile
+        now = time.time()
+        with self._lock:
+            batch = []
+            for key, alert in list(pending.items()):
+                last = self._last_sent.get(key)
+                if last is not None and now - last < self.cooldown:
+                    self.suppressed += 1
+                    del pending[key]
+                else:
+                    batch.append(alert)
+        return batch
+
+    def _compose(self, batch, settings):
+        if len(batch) == 1:
+            msg = MIMEText(batch[0].body)
+            msg['Subject'] = batch[0].subject
+        else:
+            sections = []
+            for alert in batch:
+                stamp = time.strftime("%H:%M:%S", time.localtime(alert.created))
+                sections.append(f"[{stamp}] {alert.subject}\n{alert.body}")
+            msg = MIMEText("\n\n".join(sections))
+            msg['Subject'] = f"GrowPi Alerts: {len(batch)} issues"
+        msg['From'] = settings.get("from_email", "")
+        msg['To'] = settings.get("to_email", "")
+        return msg
+
+    def _deliver(self, batch):
+        settings = self.get_settings() or {}
+        msg = self._compose(batch, settings)
+        error = None
+        # A reused session may have been dropped by the server; reconnect
+        # once before giving up on this batch.
+        for _ in range(2):
+            try:
+                self._connection(settings).send_message(msg)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                self._disconnect()
+        now = time.time()
+        with self._lock:
+            failures = self._failures
+            if error is None:
+                self.sent += len(batch)
+                self.last_error = None
+                self._failures = 0
+                for alert in batch:
+                    self._last_sent[alert.key] = now
+            else:
+                repeated = failures and str(error) == self.last_error
+                self.failed += len(batch)
+                self.last_error = str(error)
+                self._failures += 1
+                delay = min(self.retry_base * 2 ** (self._failures - 1), self.retry_max)
+                self._retry_at = now + delay
+                self._failed_key = self._settings_key(settings)
+        if error is None:
+            if failures:
+                print(f"Alert email delivered again after {failures} failed attempt(s)")
+            return True
+        if not repeated:
+            print(f"Alert email failed: {error}; retrying in {delay:.0f} s, backing off while it keeps failing")
+        return False
+
+    @staticmethod
+    def _settings_key(settings):
+        return (
+            settings.get("smtp_server", ""),
+            int(settings.get("smtp_port", 587)),
+            settings.get("username", ""),
+            settings.get("password", "")
+        )
+
+    def _connection(self, settings):
+        import smtplib  # Only needed once an alert is actually sent
+        server_key = self._settings_key(settings)
+        if not server_key[0]:
+            raise ValueError("no smtp_server in Email Settings")
+        if self._server is not None and server_key == self._server_key:
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except (smtplib.SMTPException, OSError):
+                pass
+        self._disconnect()
+        host, port, username, password = server_key
+        server = smtplib.SMTP(host, port, timeout=self.timeout)
+        try:
+            if settings.get("starttls", True):
+                server.starttls()
+            if username:
+                server.login(username, password)
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self._server = server
+            self._server_key = server_key
+        return server
+
+    def _disconnect(self):
+        with self._lock:
+            server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
@@ -1,324 +1,99 @@
-from flask import Flask, jsonify, send_from_directory, request
+from startup import Startup
+startup = Startup()  # First, so the imports below count toward the startup report
+
+from flask import Flask, Response, abort, g, jsonify, send_from_directory, request
 from flask_cors import CORS
 import os
-import json
-from meters import temp, rh, wtemp, ph
-from gpiozero import MCP3008
+
+# GROWPI_SIM=1 swaps every sensor driver for the simulated ones in
+# meters/sim.py, and python-kasa for the local stand-in in
+# controls/sim_plug.py (controls/plug.py itself still runs). The sensor
+# driver modules (and the bus libraries they import) are loaded when a
+# driver is first built, and python-kasa by the background "plugs" phase.
+IS_SIM = os.environ.get("GROWPI_SIM", "0") == "1"
 from controls import plug
+if IS_SIM:
+    from controls import sim_plug
+    sim_plug.install()
+from history import HistoryStore
+from config_store import ConfigStore
+from event_loop import EventLoopThread
+from events import format_sse
+from scheduler import Scheduler, IntervalTrigger, DailyTrigger, ThresholdWatch
+from alerts import AlertDispatcher
+from config_patch import PatchError, apply_patch, validate
+from compression import COMPRESSIBLE, MIN_SIZE, VariantCache, choose_encoding, compress
+from sensor_registry import SensorRegistry
+from zones import DEFAULT_ZONE, Zone, zone_config, zone_names, zone_section
+import control
+import derived
+from control import to_celsius, calculate_vpd
+import metrics
 import asyncio
-import threading
+import atexit
+import functools
+import json
+import mimetypes
+import queue
+import signal
+import socket
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import safe_join
+import importlib
+import sys
 import time
-import smtplib
-from email.mime.text import MIMEText
-from kasa import SmartPlug
 import datetime
-import math
 
 app = Flask(__name__, static_folder='../frontend/dist')
 CORS(app)
-
-DATA_FILE = os.path.join(os.path.dirname(__file__), "data.json")
+startup.mark("imports")
+
+# --- Server ---
+# Production server settings (see the bottom of this file)
+SERVER_PORT = int(os.environ.get("GROWPI_PORT", 5000))
+SERVER_THREADS = int(os.environ.get("GROWPI_THREADS", 8))
+SERVER_CONNECTION_LIMIT = 100
+SERVER_CHANNEL_TIMEOUT = 60  # Seconds before an idle client connection is closed
+MAX_STREAMS = max(1, SERVER_THREADS // 2)  # Live status streams each hold a thread
+
+# --- Instrumentation ---
+# Exposed in Prometheus text format at /metrics
+SENSOR_READ_SECONDS = metrics.histogram("growpi_sensor_read_seconds", "Time spent reading a sensor", ["sensor"])
+SENSOR_ERRORS = metrics.counter("growpi_sensor_errors_total", "Failed or unavailable sensor reads", ["sensor"])
+PLUG_SECONDS = metrics.histogram("growpi_plug_request_seconds", "Kasa plug round trip time", ["plug", "op"])
+PLUG_ERRORS = metrics.counter("growpi_plug_errors_total", "Failed or timed out Kasa plug requests", ["plug", "op"])
+CONFIG_LOAD_SECONDS = metrics.histogram("growpi_config_load_seconds", "Time spent in load_data")
+JOB_SECONDS = metrics.histogram("growpi_job_seconds", "Background job run time", ["job"])
+CONTROL_CYCLE_SECONDS = metrics.histogram("growpi_control_cycle_seconds", "Climate and light control cycle duration", ["zone"])
+JOB_ERRORS = metrics.counter("growpi_job_errors_total", "Background job runs that raised", ["job"])
+HTTP_SECONDS = metrics.histogram("growpi_http_request_seconds", "Flask request handling time", ["route", "method", "status"])
+
+DATA_FILE = os.environ.get("GROWPI_DATA_FILE", os.path.join(os.path.dirname(__file__), "data.json"))
+config = ConfigStore(DATA_FILE)
 
 def load_data():
-    with open(DATA_FILE, "r") as f:
-        return json.load(f)
-
-def save_data(data):
-    print("Saving data.json with Light Schedule:", data.get("Light Schedule"))
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    # Shared in-memory config; use `config.edit()` to change it
+    with CONFIG_LOAD_SECONDS.time():
+        return config.read()
 
-# Load pins from data.json
 data = load_data()
-pins = data["Sensor Pins"]
+startup.mark("config")
 
-# Sensor initialization with error handling
-sensor_errors = {}
-
-def safe_init(sensor_class, *args, name=None):
-    try:
-        return sensor_class(*args), None
-    except Exception as e:
-        sensor_errors[name] = str(e)
-        return None, str(e)
-
-def safe_read(sensor, method, error_msg):
+def safe_read(sensor, method, error_msg, name=None):
+    name = name or method
     if sensor is None:
+        SENSOR_ERRORS.inc(sensor=name)
         return {"error": error_msg}
     try:
-        return getattr(sensor, method)()
+        with SENSOR_READ_SECONDS.time(sensor=name):
+            return getattr(sensor, method)()
     except Exception as e:
+        SENSOR_ERRORS.inc(sensor=name)
         return {"error": f"Read failed: {e}"}
 
-# --- Kasa Plug Status Caching ---
-plug_status_cache = {
-    "Fan": {"status": None, "timestamp": 0},
-    "Humidifier": {"status": None, "timestamp": 0},
-    "Light": {"status": None, "timestamp": 0}
-}
-PLUG_CACHE_SECONDS = 5  # Cache duration in seconds
-
-async def async_get_plug_status(ip):
-    try:
-        plug = IotPlug(ip)
-        await plug.update()
-        return plug.is_on
-    except Exception:
-        return None
-
-def get_plug_status_cached(name, ip):
-    now = time.time()
-    cache = plug_status_cache.get(name)
-    if cache and (now - cache["timestamp"] < PLUG_CACHE_SECONDS):
-        return cache["status"]
-    # Query plug asynchronously and update cache
-    try:
-        status = asyncio.run(async_get_plug_status(ip))
-    except RuntimeError:
-        loop = asyncio.get_event_loop()
-        status = loop.run_until_complete(async_get_plug_status(ip))
-    plug_status_cache[name] = {"status": status, "timestamp": now}
-    return status
-
-# --- Sensor Initialization ---
-IS_DEV = os.environ.get("GROWPI_DEV", "0") == "1"
-
-if IS_DEV:
-    temp_sensor, temp_error = None, "Temperature sensor not available (mocked)"
-    rh_sensor, rh_error = None, "Humidity sensor not available (mocked)"
-    wtemp_sensor, wtemp_error = None, "Water temperature sensor not available (mocked)"
-    ph_sensor, ph_error = None, "pH sensor not available (mocked)"
-else:
-    temp_sensor, temp_error = safe_init(temp.TemperatureSensor, name="temperature")
-    rh_sensor, rh_error = safe_init(rh.RHMeter, name="humidity")
-    wtemp_sensor, wtemp_error = safe_init(wtemp.WaterTemperatureSensor, name="water_temperature")
-    ph_cal = data.get("PH Calibration", {"slope": -5.6548, "intercept": 15.509})
-    ph_sensor, ph_error = safe_init(
-        ph.PHMeter,
-        pins["Water pH Sensor"],
-        ph_cal["slope"],
-        ph_cal["intercept"],
-        name="ph"
-    )
-
-# --- Background Thread for pH Monitoring ---
-def send_email(subject, body):
-    data = load_data()
-    email_settings = data.get("Email Settings", {})
-    msg = MIMEText(body)
-    msg['Subject'] = subject
-    msg['From'] = email_settings.get("from_email", "")
-    msg['To'] = email_settings.get("to_email", "")
-
-    with smtplib.SMTP(email_settings.get("smtp_server", ""), int(email_settings.get("smtp_port", 587))) as server:
-        server.starttls()
-        server.login(email_settings.get("username", ""), email_settings.get("password", ""))
-        server.send_message(msg)
-
-def ph_monitor_loop():
-    while True:
-        try:
-            ph_value = safe_read(ph_sensor, "read_ph", ph_error or sensor_errors.get("ph", "pH sensor not available"))
-            data = load_data()
-            stage = data["State"]["Current Stage"]
-            ph_range = data["Ideal Ranges"][stage]["Water pH"]
-            min_ph = ph_range["min"]
-            max_ph = ph_range["max"]
-            if isinstance(ph_value, (int, float)) and (ph_value < min_ph or ph_value > max_ph):
-                send_email(
-                    subject="GrowPi Alert: pH Out of Range",
-                    body=f"Current pH is {ph_value:.2f}, which is outside the ideal range ({min_ph}-{max_ph})."
-                )
-        except Exception as e:
-            print(f"pH monitor error: {e}")
-        time.sleep(4 * 60 * 60)  # 4 hours
-
-threading.Thread(target=ph_monitor_loop, daemon=True).start()
-
-# --- Climate and Light Control ---
-
-def run_climate_and_light_control():
-    data = load_data()
-    stage = data["State"]["Current Stage"]
-    light_state = "Lights On"  # Or determine based on schedule
-    ideal = data["Ideal Ranges"][stage]
-    kasa = data["Kasa configs"]
-    device_ips = kasa["Device_IPs"]
-    user = kasa["Username"]
-    pwd = kasa["Password"]
-
-    units = data.get("Units", {})
-    humidity_metric = units.get("Humidity Metric", "RH")
-    temp_unit = units.get("Temperature", "F")
-
-    temp_val = safe_read(temp_sensor, "read_temp", temp_error or sensor_errors.get("temperature", "Temperature sensor not available"))
-    rh_val = safe_read(rh_sensor, "read_rh", rh_error or sensor_errors.get("humidity", "Humidity sensor not available"))
-
-    # --- FIX: Ensure temp_range is a flat dict ---
-    temp_range = ideal["Air Temperature"][light_state]
-    if not (isinstance(temp_range, dict) and "min" in temp_range and "max" in temp_range and "target" in temp_range):
-        print(f"Climate/Light control error: temp_range is not a valid dict: {temp_range}")
-        return ["Error: Invalid temperature range configuration."]
-
-    if humidity_metric == "VPD" and isinstance(temp_val, (int, float)) and isinstance(rh_val, (int, float)):
-        temp_c = temp_val if temp_unit == "C" else to_celsius(temp_val)
-        humidity_val = calculate_vpd(temp_c, rh_val)
-        hum_range = ideal.get("VPD", {"min": 0.8, "max": 1.2, "target": 1.0})
-    else:
-        humidity_val = rh_val
-        hum_range = ideal.get("Relative Humidity", {"min": 40, "max": 60, "target": 50})
-
-    actions = []
-
-    async def control_devices():
-        fan_on = True  # Default: keep fan ON
-        humid_on = False
-        dehumid_on = False
-        heater_on = False
-
-        # --- Fan logic ---
-        if humidity_metric == "VPD":
-            # Fan ON if temp > min and VPD < max (humid, needs drying)
-            if isinstance(temp_val, (int, float)) and isinstance(humidity_val, (int, float)) and temp_val > temp_range["min"] and humidity_val < hum_range["max"]:
-                fan_on = True
-                actions.append("Fan ON (temp > min and VPD < max: air humid, drying)")
-            else:
-                fan_on = False
-                actions.append("Fan OFF (temp <= min or VPD >= max: air dry or temp low)")
-        else:
-            # Original logic for RH
-            if isinstance(temp_val, (int, float)) and temp_val < temp_range["min"]:
-                fan_on = False
-                actions.append("Fan OFF (temp too low)")
-            else:
-                fan_on = True
-                actions.append("Fan ON (temp at/above min)")
-
-        # Humidifier logic (fix for VPD)
-        if humidity_metric == "VPD":
-            # For VPD, high value = low RH (too dry), so turn ON humidifier if VPD > max
-            if humidity_val > hum_range["max"]:
-                humid_on = True
-                actions.append("Humidifier ON (VPD too high, air too dry)")
-            else:
-                humid_on = False
-                actions.append("Humidifier OFF (VPD ok or too low)")
-            # For dehumidifier, turn ON if VPD < min (too humid)
-            if "Dehumidifier" in device_ips:
-                if humidity_val < hum_range["min"]:
-                    dehumid_on = True
-                    actions.append("Dehumidifier ON (VPD too low, air too humid)")
-                else:
-                    dehumid_on = False
-                    actions.append("Dehumidifier OFF (VPD ok or too high)")
-        else:
-            # RH logic (original)
-            if humidity_val < hum_range["min"]:
-                humid_on = True
-                actions.append("Humidifier ON (RH too low)")
-            else:
-                humid_on = False
-                actions.append("Humidifier OFF (RH ok or too high)")
-            if "Dehumidifier" in device_ips:
-                if humidity_val > hum_range["max"]:
-                    dehumid_on = True
-                    actions.append("Dehumidifier ON (RH too high)")
-                else:
-                    dehumid_on = False
-                    actions.append("Dehumidifier OFF (RH ok or too low)")
-
-        # --- Dehumidifier logic ---
-        if "Dehumidifier" in device_ips:
-            if humidity_val > hum_range["max"]:
-                dehumid_on = True
-                actions.append("Dehumidifier ON (humidity too high)")
-            elif humidity_val <= hum_range["target"]:
-                dehumid_on = False
-                actions.append("Dehumidifier OFF (humidity at/below target)")
-            else:
-                actions.append("Dehumidifier state unchanged")
-
-        # --- Heater logic ---
-        # Turn ON if temp < min, OFF if >= target
-        if "Heater" in device_ips:
-            if temp_val < temp_range["min"]:
-                heater_on = True
-                actions.append("Heater ON (temp too low)")
-            elif temp_val >= temp_range["target"]:
-                heater_on = False
-                actions.append("Heater OFF (temp at/above target)")
-            else:
-                actions.append("Heater state unchanged")
-
-        # --- Apply actions to plugs ---
-        if "Fan" in device_ips:
-            if fan_on:
-                await plug.turnOn(device_ips["Fan"], user, pwd)
-            else:
-                await plug.turnOff(device_ips["Fan"], user, pwd)
-        if "Humidifier" in device_ips:
-            if humid_on:
-                await plug.turnOn(device_ips["Humidifier"], user, pwd)
-            else:
-                await plug.turnOff(device_ips["Humidifier"], user, pwd)
-        if "Dehumidifier" in device_ips:
-            if dehumid_on:
-                await plug.turnOn(device_ips["Dehumidifier"], user, pwd)
-            else:
-                await plug.turnOff(device_ips["Dehumidifier"], user, pwd)
-        if "Heater" in device_ips:
-            if heater_on:
-                await plug.turnOn(device_ips["Heater"], user, pwd)
-            else:
-                await plug.turnOff(device_ips["Heater"], user, pwd)
-
-        # --- Light schedule logic ---
-        now = datetime.datetime.now().time()
-        light_sched = data.get("Light Schedule", {"on": "06:00", "off": "22:00"})
-        on_time = datetime.datetime.strptime(light_sched["on"], "%H:%M").time()
-        off_time = datetime.datetime.strptime(light_sched["off"], "%H:%M").time()
-
-        # Handle overnight schedules
-        if on_time < off_time:
-            light_should_be_on = on_time <= now < off_time
-        else:
-            light_should_be_on = now >= on_time or now < off_time
-
-        # Query current light state
-        try:
-            current_light_state = await async_get_plug_status(device_ips["Light"])
-        except Exception:
-            current_light_state = None
-
-        if light_should_be_on and not current_light_state:
-            await plug.turnOn(device_ips["Light"], user, pwd)
-            actions.append("Light ON (according to schedule)")
-        elif not light_should_be_on and current_light_state:
-            await plug.turnOff(device_ips["Light"], user, pwd)
-            actions.append("Light OFF (according to schedule)")
-        else:
-            actions.append(f"Light {'ON' if current_light_state else 'OFF'} (already correct)")
-
-    asyncio.run(control_devices())
-    return actions
-
-# Background thread to run every 5 minutes
-def climate_and_light_loop():
-    while True:
-        try:
-            actions = run_climate_and_light_control()
-            print(f"[{datetime.datetime.now()}] Climate/Light actions: {actions}")
-        except Exception as e:
-            print(f"Climate/Light control error: {e}")
-        time.sleep(5 * 60)
-
-threading.Thread(target=climate_and_light_loop, daemon=True).start()
-
 # --- Utility Functions ---
 
-def to_celsius(f):
-    return (f - 32) * 5.0 / 9.0
-
 def to_24h(time_str):
     return time_str
 
@@ -328,17 +103,291 @@ def to_12h(time_str):
     hour12 = hour % 12 or 12
     return f"{hour12}:{minute:02d} {ampm}"
 
-def calculate_vpd(temp_c, rh):
-    svp = 0.61078 * math.exp(17.27 * temp_c / (temp_c + 237.3))
-    avp = svp * (rh / 100.0)
-    vpd = svp - avp
-    return round(vpd, 3)
+# --- Kasa I/O ---
+# All plug traffic runs on one long-lived loop so pooled connections survive
+# between calls.
+PLUG_TIMEOUT = 10  # Seconds to wait for a single plug query
+CONTROL_TIMEOUT = 60  # Seconds to wait for a whole control cycle
+DISCOVERY_TIMEOUT = 20  # Seconds /find_kasa waits; a longer scan finishes in the background
+
+DISCOVERY_CACHE_SECONDS = 10 * 60  # How long a discovery scan stays fresh
+PLUG_ROLES = ["Fan", "Humidifier", "Light", "Dehumidifier", "Heater"]
+
+kasa_loop = EventLoopThread()
+kasa_loop.start()
+kasa_directory = plug.AliasDirectory(ttl=DISCOVERY_CACHE_SECONDS)
+
+# --- Zones ---
+# Each grow space has its own sensors, plugs, stage, ranges and schedule (see
+# zones.py). A data.json without "Zones" runs a single default zone from its
+# top-level settings, exactly as before.
+zones = {name: Zone(name) for name in zone_names(data)}
+main_zone = zones[DEFAULT_ZONE]
+
+def zone_data(zone):
+    return zone_config(load_data(), zone.name)
+
+# --- Kasa Plug State Cache ---
+# Each zone keeps the last known state of every plug in its Device_IPs
+# (zone.plugs, see plug_cache.py). The plug_refresh job polls the stale ones
+# in parallel in the background and the controller's commands write through,
+# so /api/status and the live stream only ever read the cache.
+PLUG_REFRESH_SECONDS = 15  # Poll interval, and the first backoff step for an unreachable plug
 
-# --- Flask Routes ---
+async def async_get_plug_status(ip):
+    kasa = load_data()["Kasa configs"]
+    return await plug.async_get_plug_status(ip, kasa["Username"], kasa["Password"])
 
-@app.route('/api/status')
-def status():
-    data = load_data()
+async def query_plug(zone, name, ip):
+    try:
+        with PLUG_SECONDS.time(plug=zone.key(name), op="status"):
+            status = await asyncio.wait_for(async_get_plug_status(ip), PLUG_TIMEOUT)
+    except asyncio.TimeoutError:
+        status = None
+    if status is None:
+        PLUG_ERRORS.inc(plug=zone.key(name), op="status")
+        zone.plugs.failed(name, f"No answer from {ip}")
+    else:
+        set_known_plug_state(zone, name, status, source="poll")
+    return status
+
+async def refresh_plugs(zone, device_ips):
+    # Polls every plug that is due, concurrently. A state confirmed within
+    # the last half interval (e.g. by a command) counts as fresh.
+    due = zone.plugs.due([name for name, ip in device_ips.items() if ip], PLUG_REFRESH_SECONDS / 2)
+    await asyncio.gather(*(query_plug(zone, name, device_ips[name]) for name in due))
+    return due
+
+def plug_refresh_job(zone):
+    device_ips = zone_data(zone)["Kasa configs"]["Device_IPs"]
+    kasa_loop.run(refresh_plugs(zone, device_ips), timeout=PLUG_TIMEOUT + 1)
+
+# --- Plug Actuation ---
+# The controller remembers the last state it saw or set for every plug and
+# only sends commands for plugs that need to change. Known states expire
+# after PLUG_RESYNC_SECONDS (a plug that stopped answering polls) so a plug
+# switched by hand is corrected later.
+PLUG_RESYNC_SECONDS = 30 * 60
+PLUG_RECORD_SECONDS = 30 * 60  # Unchanged states are re-recorded this often so history covers long ranges
+
+def set_known_plug_state(zone, name, is_on, source="command"):
+    previous = zone.plugs.set(name, is_on, source)
+    now = time.time()
+    recorded = zone.plugs.entry(name)["recorded"]
+    if previous != is_on or recorded is None or now - recorded > PLUG_RECORD_SECONDS:
+        record_plug_state(zone, name, is_on)
+        zone.plugs.mark_recorded(name, now)
+    if previous != is_on:
+        publish_status(zone)
+
+def known_plug_state(zone, name):
+    return zone.plugs.state(name, max_age=PLUG_RESYNC_SECONDS)
+
+async def apply_plug_states(zone, device_ips, desired, user, pwd):
+    # Switch every plug whose desired state differs from its known state,
+    # concurrently and with a per-plug timeout. Returns the attempted changes
+    # and a dict of the ones that failed.
+    async def switch(name, on):
+        command = plug.turnOn if on else plug.turnOff
+        op = "on" if on else "off"
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(command(device_ips[name], user, pwd), PLUG_TIMEOUT)
+        except Exception as e:
+            PLUG_ERRORS.inc(plug=zone.key(name), op=op)
+            zone.plugs.failed(name, f"{op} command failed: {e!r}")
+            raise
+        finally:
+            PLUG_SECONDS.observe(time.perf_counter() - started, plug=zone.key(name), op=op)
+        set_known_plug_state(zone, name, on)
+
+    changes = {name: on for name, on in desired.items() if known_plug_state(zone, name) != on}
+    results = await asyncio.gather(*(switch(name, on) for name, on in changes.items()), return_exceptions=True)
+    failed = {name: result for name, result in zip(changes, results) if isinstance(result, Exception)}
+    return changes, failed
+
+# --- Sensor Initialization ---
+IS_DEV = os.environ.get("GROWPI_DEV", "0") == "1"
+MOCK_ERRORS = {
+    "temperature": "Temperature sensor not available (mocked)",
+    "humidity": "Humidity sensor not available (mocked)",
+    "water_temperature": "Water temperature sensor not available (mocked)",
+    "ph": "pH sensor not available (mocked)"
+}
+
+DEFAULT_PH_CALIBRATION = {"slope": -5.6548, "intercept": 15.509}
+
+def ph_calibration_args(cal):
+    # PHMeter keyword arguments for a "PH Calibration" setting
+    return {
+        "slope": cal.get("slope", DEFAULT_PH_CALIBRATION["slope"]),
+        "intercept": cal.get("intercept", DEFAULT_PH_CALIBRATION["intercept"]),
+        "cal_type": cal.get("type", "linear"),
+        "a": cal.get("a", 0),
+        "b": cal.get("b", 0),
+        "c": cal.get("c", 0)
+    }
+
+def sensor_specs(data):
+    # (wiring, settings) for each sensor of a zone's config. Changing the
+    # wiring rebuilds a driver; settings are applied to the running one.
+    climate = (
+        (data.get("Climate Sensor", {}).get("i2c_bus"),),
+        {"cache_seconds": data.get("Climate Cache Seconds", 2)}
+    )
+    return {
+        "temperature": climate,
+        "humidity": climate,
+        "water_temperature": (
+            (data.get("Water Temperature Probes"), data.get("Water Temperature Resolution")),
+            {}
+        ),
+        "ph": (
+            (data["Sensor Pins"]["Water pH Sensor"],),
+            {"calibration": data.get("PH Calibration", DEFAULT_PH_CALIBRATION), "sampling": data.get("PH Sampling")}
+        )
+    }
+
+SENSOR_MODULES = {"temperature": "meters.temp", "humidity": "meters.rh", "water_temperature": "meters.wtemp", "ph": "meters.ph"}
+
+def build_sensor(name, wiring, settings):
+    if IS_DEV and not IS_SIM:
+        raise RuntimeError(MOCK_ERRORS[name])
+    module = importlib.import_module("meters.sim" if IS_SIM else SENSOR_MODULES[name])
+    if name == "temperature":
+        return module.TemperatureSensor(settings["cache_seconds"], *wiring)
+    if name == "humidity":
+        return module.RHMeter(settings["cache_seconds"], *wiring)
+    if name == "water_temperature":
+        return module.WaterTemperatureSensor(*wiring)
+    return module.PHMeter(*wiring, **ph_calibration_args(settings["calibration"]), sampling=settings["sampling"])
+
+def update_sensor(name, driver, settings):
+    if name in ("temperature", "humidity"):
+        driver.climate.cache_seconds = settings["cache_seconds"]
+    elif name == "ph":
+        # New coefficients only; the MCP3008 channel stays open
+        driver.set_calibration(**ph_calibration_args(settings["calibration"]))
+        driver.configure_sampling(**(settings["sampling"] or {}))
+
+def configure_zone_sensors(zone):
+    # Brings the zone's drivers in line with its config and re-reads the
+    # sensors that changed
+    changed = zone.sensors.configure(sensor_specs(zone_data(zone)))
+    if changed:
+        zone.sampler.refresh(*changed)
+    return changed
+
+# Drivers are built by the background "sensors" phase, not here
+for zone in zones.values():
+    zone.sensors = SensorRegistry(build_sensor, update_sensor)
+    configure_zone_sensors(zone)
+startup.mark("zones")
+
+# --- Background Sensor Sampling ---
+# Routes and control loops read the latest snapshot instead of the buses.
+DEFAULT_SAMPLING_INTERVALS = {"climate": 10, "water_temperature": 10, "ph": 30}
+
+def read_sensor(zone, name, method, default_error):
+    sensor, error = zone.sensors.get(name)
+    return safe_read(sensor, method, error or default_error, zone.key(name))
+
+def read_climate(zone):
+    # Both values from a single HTU21D measurement, even with "Climate Cache
+    # Seconds" at 0, so VPD and dew point pair readings taken together
+    sensor, error = zone.sensors.get("temperature")
+    reading = safe_read(sensor.climate if sensor else None, "read",
+                        error or "Climate sensor not available", zone.key("climate"))
+    if isinstance(reading, dict):
+        return {"temperature": reading, "humidity": reading}
+    celsius, rh = reading
+    return {"temperature": derived.c_to_f(celsius), "humidity": rh}
+
+def read_water_temperature(zone):
+    # The driver converts in the background; this returns its latest values
+    probes = read_sensor(zone, "water_temperature", "read_all", "Water temperature sensor not available")
+    if "error" in probes:
+        return {"water_temperature": probes, "water_probes": None}
+    sensor, _ = zone.sensors.get("water_temperature")
+    return {"water_temperature": probes[sensor.primary], "water_probes": probes}
+
+def read_ph(zone):
+    # pH and the noise estimate from the same burst of ADC samples
+    result = read_sensor(zone, "ph", "read_ph_sample", "pH sensor not available")
+    if isinstance(result, dict):
+        return {"ph": result, "ph_noise": None}
+    return {"ph": result[0], "ph_noise": result[1]}
+
+def sampling_intervals(zone):
+    return {**DEFAULT_SAMPLING_INTERVALS, **zone_data(zone).get("Sampling Intervals", {})}
+
+def apply_sampling_intervals(zone):
+    # After a config change; the sampler picks the new intervals up right away
+    intervals = sampling_intervals(zone)
+    zone.sampler.set_interval("temperature", intervals["climate"])
+    zone.sampler.set_interval("water_temperature", intervals["water_temperature"])
+    zone.sampler.set_interval("ph", intervals["ph"])
+
+for zone in zones.values():
+    intervals = sampling_intervals(zone)
+    zone.sampler.add_group(("temperature", "humidity"), functools.partial(read_climate, zone), intervals["climate"])
+    zone.sampler.add_group(("water_temperature", "water_probes"), functools.partial(read_water_temperature, zone), intervals["water_temperature"])
+    zone.sampler.add_group(("ph", "ph_noise"), functools.partial(read_ph, zone), intervals["ph"])
+
+# --- History ---
+# Metrics of zones other than the default are stored as "<zone>.<metric>".
+# Derived metrics (derived.METRICS, plus the daily light integral) aren't
+# stored; they are computed from the stored samples when queried.
+HISTORY_FILE = os.environ.get("GROWPI_HISTORY_FILE", os.path.join(os.path.dirname(__file__), "history.db"))
+SENSOR_METRICS = ["temperature", "humidity", "water_temperature", "ph", "ph_noise"]
+PLUG_METRICS = ["fan", "humidifier", "dehumidifier", "heater", "light"]
+STORED_METRICS = SENSOR_METRICS + PLUG_METRICS
+HISTORY_METRICS = STORED_METRICS + list(derived.METRICS) + ["dli"]
+LIGHT_LOOKBACK = 24 * 60 * 60  # Light changes are recorded ~twice a day; look back for the state at `from`
+
+history = HistoryStore(HISTORY_FILE)
+
+def record_reading(zone, name, reading):
+    history.record(zone.key(name), reading.value, reading.timestamp)
+
+def record_plug_state(zone, name, is_on):
+    history.record(zone.key(name.lower()), is_on)
+
+def derived_history(zone, metric, start, end, step):
+    # Buckets like history.query(), computed over the raw input samples
+    import numpy as np  # Loaded on the first history query, not at startup
+    settings = derived.settings(zone_data(zone))
+    step = history.resolve_step(start, end, step)
+    if metric == "dli":
+        # Light fraction of each bucket at the configured PPFD, scaled to a
+        # day: step=86400 gives the DLI of each day
+        if not settings["light_ppfd"]:
+            return []
+        rows = history.samples(zone.key("light"), start - LIGHT_LOOKBACK, end)
+        ts, states = (np.array(column) for column in zip(*rows)) if rows else (np.empty(0), np.empty(0))
+        edges = np.append(np.arange(start, end, step), end)
+        seconds = derived.on_seconds(ts, states, edges)
+        values = derived.dli(settings["light_ppfd"], seconds * 86400 / np.diff(edges))
+        return [{"t": t, "min": value, "mean": value, "max": value, "count": 1}
+                for t, value in zip(edges[:-1].tolist(), values.tolist())]
+
+    spec = derived.METRICS[metric]
+    series = []
+    for name in spec.inputs:
+        rows = history.samples(zone.key(name), start, end)
+        if not rows:
+            return []
+        series.append(np.array(rows).T)
+    # Evaluate at the first input's timestamps, with the other inputs as of then
+    ts = series[0][0]
+    inputs = [series[0][1]] + [derived.align(ts, *columns) for columns in series[1:]]
+    return derived.bucket(ts, spec.compute(settings, *inputs), start, step)
+
+# --- Status ---
+# Shared by /api/status and the live stream. Plug states come from the
+# zone's cache; building a status never waits on a plug.
+def build_status(zone, snapshot):
+    data = zone_data(zone)
     device_ips = data["Kasa configs"]["Device_IPs"]
     units = data.get("Units", {})
     temp_unit = units.get("Temperature", "F")
@@ -347,15 +396,20 @@ def status():
     stage = data["State"].get("Current Stage")
     ideal = data["Ideal Ranges"].get(stage, {}) if stage else {}
 
-    temp_val = safe_read(temp_sensor, "read_temp", temp_error or sensor_errors.get("temperature", "Temperature sensor not available"))
-    rh_val = safe_read(rh_sensor, "read_rh", rh_error or sensor_errors.get("humidity", "Humidity sensor not available"))
-    wtemp_val = safe_read(wtemp_sensor, "read_temp", wtemp_error or sensor_errors.get("water_temperature", "Water temperature sensor not available"))
+    temp_val = snapshot.value("temperature")
+    rh_val = snapshot.value("humidity")
+    wtemp_val = snapshot.value("water_temperature")
 
     # Convert temperature if needed
     if temp_unit == "C" and isinstance(temp_val, (int, float)):
         temp_val = round(to_celsius(temp_val), 2)
     if temp_unit == "C" and isinstance(wtemp_val, (int, float)):
         wtemp_val = round(to_celsius(wtemp_val), 2)
+    wtemp_probes = snapshot.value("water_probes")
+    if not isinstance(wtemp_probes, dict) or "error" in wtemp_probes:
+        wtemp_probes = None
+    elif temp_unit == "C":
+        wtemp_probes = {name: round(to_celsius(value), 2) for name, value in wtemp_probes.items()}
 
     # Calculate VPD if needed
     if humidity_metric == "VPD" and isinstance(temp_val, (int, float)) and isinstance(rh_val, (int, float)):
@@ -375,293 +429,911 @@ def status():
         light_on = to_12h(light_sched["on"])
         light_off = to_12h(light_sched["off"])
 
-    return jsonify({
+    return {
         "temperature": temp_val,
         "humidity": humidity_val,
         "humidity_metric": humidity_metric,
         "hum_range": hum_range,
-        "ph": safe_read(ph_sensor, "read_ph", ph_error or sensor_errors.get("ph", "pH sensor not available")),
+        "ph": snapshot.value("ph"),
+        "ph_noise": snapshot.value("ph_noise"),
         "wtemp": wtemp_val,
-        "fan_status": get_plug_status_cached("Fan", device_ips.get("Fan", "")),
-        "humidifier_status": get_plug_status_cached("Humidifier", device_ips.get("Humidifier", "")),
-        "light_status": get_plug_status_cached("Light", device_ips.get("Light", "")),
+        "wtemp_probes": wtemp_probes,
+        "fan_status": zone.plugs.state("Fan"),
+        "humidifier_status": zone.plugs.state("Humidifier"),
+        "dehumidifier_status": zone.plugs.state("Dehumidifier"),
+        "heater_status": zone.plugs.state("Heater"),
+        "light_status": zone.plugs.state("Light"),
+        "plugs": zone.plugs.info(device_ips),
         "light_on": light_on,
-        "light_off": light_off
+        "light_off": light_off,
+        "derived": derived.compute({"temperature": snapshot.value("temperature"), "humidity": rh_val},
+                                   derived.settings(data))
+    }
+
+# --- Live Status Stream ---
+STREAM_KEEPALIVE_SECONDS = 15
+
+def publish_status(zone, *_):
+    zone.broadcaster.publish(build_status(zone, zone.sampler.snapshot()))
+
+for zone in zones.values():
+    zone.sampler.subscribe(functools.partial(record_reading, zone))
+    zone.sampler.subscribe(functools.partial(publish_status, zone))
+
+# --- Background Thread for pH Monitoring ---
+alerts = AlertDispatcher(lambda: load_data().get("Email Settings", {}))
+
+def configure_alerts(data):
+    # At startup and whenever "Notification Settings" changes
+    notifications = data.get("Notification Settings", {})
+    alerts.cooldown = notifications.get("Alert Cooldown Minutes", 60) * 60
+    alerts.digest_seconds = notifications.get("Alert Digest Seconds", 5)
+
+configure_alerts(data)
+
+def send_email(subject, body, key=None):
+    # Queued and sent by the alert worker; repeats of the same key within
+    # the cooldown are dropped
+    return alerts.send(key or subject, subject, body)
+
+def ph_monitor_job(zone):
+    zone.sampler.wait_ready(timeout=30)
+    try:
+        ph_value = zone.sampler.snapshot().value("ph")
+        data = zone_data(zone)
+        stage = data["State"]["Current Stage"]
+        ph_range = data["Ideal Ranges"][stage]["Water pH"]
+        min_ph = ph_range["min"]
+        max_ph = ph_range["max"]
+        if isinstance(ph_value, (int, float)) and (ph_value < min_ph or ph_value > max_ph):
+            where = "" if zone.name == DEFAULT_ZONE else f" ({zone.name})"
+            send_email(
+                subject=f"GrowPi Alert: pH Out of Range{where}",
+                body=f"Current pH is {ph_value:.2f}, which is outside the ideal range ({min_ph}-{max_ph}).",
+                key=zone.key("ph")
+            )
+        elif isinstance(ph_value, (int, float)):
+            alerts.resolve(zone.key("ph"))
+    except Exception as e:
+        JOB_ERRORS.inc(job=zone.job("ph_monitor"))
+        print(f"pH monitor error{'' if zone.name == DEFAULT_ZONE else ' in ' + zone.name}: {e}")
+
+def check_derived_ranges(zone, name, reading):
+    # Sampler listener: alerts when a derived metric leaves the Ideal Ranges
+    # entry named by its range_key (e.g. "Dew Point"); metrics without a
+    # configured range are skipped
+    affected = [metric for metric in derived.METRICS.values() if name in metric.inputs and metric.range_key]
+    if not affected:
+        return
+    data = zone_data(zone)
+    ideal = data["Ideal Ranges"].get(data["State"].get("Current Stage"), {})
+    affected = [metric for metric in affected if "min" in ideal.get(metric.range_key, {})]
+    if not affected:
+        return
+    settings = derived.settings(data)
+    snapshot = zone.sampler.snapshot()
+    values = derived.compute({key: snapshot.value(key) for metric in affected for key in metric.inputs}, settings)
+    where = "" if zone.name == DEFAULT_ZONE else f" ({zone.name})"
+    for metric in affected:
+        value = values.get(metric.name)
+        if value is None:
+            continue
+        bounds = ideal[metric.range_key]
+        if bounds["min"] <= value <= bounds["max"]:
+            alerts.resolve(zone.key(metric.name))
+            continue
+        send_email(
+            subject=f"GrowPi Alert: {metric.range_key} Out of Range{where}",
+            body=f"Current {metric.label.lower()} is {value:.2f} {metric.unit_for(settings)}, "
+                 f"which is outside the ideal range ({bounds['min']}-{bounds['max']}).",
+            key=zone.key(metric.name)
+        )
+
+for zone in zones.values():
+    zone.sampler.subscribe(functools.partial(check_derived_ranges, zone))
+
+# --- Climate and Light Control ---
+
+def run_climate_and_light_control(zone=main_zone):
+    data = zone_data(zone)
+    kasa = data["Kasa configs"]
+    device_ips = kasa["Device_IPs"]
+    user = kasa["Username"]
+    pwd = kasa["Password"]
+
+    snapshot = zone.sampler.snapshot()
+    desired, actions = control.decide(
+        data,
+        snapshot.value("temperature"),
+        snapshot.value("humidity"),
+        datetime.datetime.now()
+    )
+    if desired is None:
+        print(f"Climate/Light control error: {actions[0]}")
+        return actions
+
+    async def control_devices():
+        # --- Apply actions to plugs ---
+        changes, failed = await apply_plug_states(zone, device_ips, desired, user, pwd)
+
+        if "Light" in desired:
+            light_label = "ON" if desired["Light"] else "OFF"
+            if "Light" not in changes:
+                actions.append(f"Light {light_label} (already correct)")
+            elif "Light" not in failed:
+                actions.append(f"Light {light_label} (according to schedule)")
+        for name, err in failed.items():
+            actions.append(f"{name} command failed: {err!r}")
+
+    kasa_loop.run(control_devices(), timeout=CONTROL_TIMEOUT)
+    return actions
+
+def climate_and_light_job(zone):
+    zone.sampler.wait_ready(timeout=30)
+    where = "" if zone.name == DEFAULT_ZONE else f" [{zone.name}]"
+    try:
+        with CONTROL_CYCLE_SECONDS.time(zone=zone.name):
+            actions = run_climate_and_light_control(zone)
+        print(f"[{datetime.datetime.now()}]{where} Climate/Light actions: {actions}")
+    except Exception as e:
+        JOB_ERRORS.inc(job=zone.job("climate_control"))
+        print(f"Climate/Light control error{where}: {e}")
+
+# --- Scheduler ---
+# Each zone's control cycle runs every 5 minutes, at its light on/off times,
+# and as soon as its air temperature or humidity leaves (or re-enters) its
+# range. The pH check runs every 4 hours and immediately when pH crosses its
+# range. Zones' jobs run on separate worker threads, so they run concurrently.
+# Range crossings re-arm only once a reading is back inside by
+# THRESHOLD_DEADBAND of the range width, and start a job at most once per
+# EVENT_MIN_GAP. Every zone's plugs are polled every PLUG_REFRESH_SECONDS.
+CLIMATE_INTERVAL = 5 * 60
+PH_MONITOR_INTERVAL = 4 * 60 * 60
+THRESHOLD_DEADBAND = 0.1
+EVENT_MIN_GAP = 60
+
+def light_schedule_times(zone):
+    sched = zone_data(zone).get("Light Schedule", {"on": "06:00", "off": "22:00"})
+    return [sched["on"], sched["off"]]
+
+def sensor_range(zone, name):
+    # (min, max) for a sampled sensor in its raw unit, or None
+    return control.sensor_range(zone_data(zone), name)
+
+def instrumented(name, func):
+    def run():
+        with JOB_SECONDS.time(job=name):
+            try:
+                func()
+            except Exception:
+                JOB_ERRORS.inc(job=name)
+                raise
+    return run
+
+scheduler = Scheduler()
+for zone in zones.values():
+    scheduler.add_job(
+        zone.job("climate_control"),
+        instrumented(zone.job("climate_control"), functools.partial(climate_and_light_job, zone)),
+        IntervalTrigger(CLIMATE_INTERVAL, jitter=15),
+        DailyTrigger(functools.partial(light_schedule_times, zone)),
+        min_event_gap=EVENT_MIN_GAP
+    )
+    scheduler.add_job(
+        zone.job("ph_monitor"),
+        instrumented(zone.job("ph_monitor"), functools.partial(ph_monitor_job, zone)),
+        IntervalTrigger(PH_MONITOR_INTERVAL, jitter=60),
+        min_event_gap=EVENT_MIN_GAP
+    )
+    scheduler.add_job(
+        zone.job("plug_refresh"),
+        instrumented(zone.job("plug_refresh"), functools.partial(plug_refresh_job, zone)),
+        IntervalTrigger(PLUG_REFRESH_SECONDS, jitter=1),
+        run_at_start=False
+    )
+    zone_range = functools.partial(sensor_range, zone)
+    zone.sampler.subscribe(ThresholdWatch(scheduler, zone.job("climate_control"), ["temperature", "humidity"], zone_range, THRESHOLD_DEADBAND))
+    zone.sampler.subscribe(ThresholdWatch(scheduler, zone.job("ph_monitor"), ["ph"], zone_range, THRESHOLD_DEADBAND))
+
+metrics.gauge("growpi_sensor_age_seconds", "Seconds since each sensor was last sampled", ["sensor"],
+              lambda: {(zone.key(name),): age for zone in zones.values() for name, age in zone.sampler.snapshot().ages().items()})
+metrics.gauge("growpi_stream_subscribers", "Connected /api/stream clients",
+              func=lambda: sum(zone.broadcaster.subscriber_count() for zone in zones.values()))
+metrics.gauge("growpi_alerts_queued", "Alert emails waiting to be sent", func=lambda: alerts.info()["queued"])
+metrics.gauge("growpi_job_running", "Whether a background job is currently running", ["job"],
+              lambda: {(job["name"],): int(job["running"]) for job in scheduler.jobs()})
+
+# --- Flask Routes ---
+# Zone-scoped routes are registered twice: at their original path for the
+# default zone and under /api/zones/<zone_name>/ for every zone.
+
+def unknown_zone(zone_name):
+    return jsonify({"error": f"Unknown zone {zone_name!r}. Zones: {', '.join(zones)}"}), 404
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method, status=response.status_code)
+    return response
+
+# --- Response Caching and Compression ---
+# Config-derived GETs are serialized and compressed once per config version
+# and carry a weak ETag, so a dashboard reload mostly gets 304s. Other
+# responses are compressed on the way out, and the built frontend is served
+# from the precompressed copies the Vite build writes.
+CONFIG_ETAG_PREFIX = format(int(time.time()), "x")  # Versions restart with the process
+ASSET_MAX_AGE = 365 * 24 * 3600  # Vite puts a content hash in every asset name
+config_responses = VariantCache()
+
+def config_etag():
+    return f"{CONFIG_ETAG_PREFIX}-{config.version}"
+
+def config_json(key, build):
+    # JSON response for `build()`, which must only depend on data.json
+    load_data()  # Notices hand edits before the version is read
+    tag = config_etag()
+    if request.if_none_match.contains_weak(tag):
+        response = Response(status=304)
+    else:
+        def serialize():
+            return app.json.dumps(build()).encode()
+        body = config_responses.body(key, tag, serialize)
+        encoding = choose_encoding(request.accept_encodings) if len(body) >= MIN_SIZE else None
+        response = Response(config_responses.body(key, tag, serialize, encoding), mimetype="application/json")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(tag, weak=True)
+    response.cache_control.no_cache = True
+    response.vary.add("Accept-Encoding")
+    return response
+
+@app.after_request
+def compress_response(response):
+    if (response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE or response.status_code in (204, 304)):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None or len(body) < MIN_SIZE:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+def send_static(directory, filename, immutable=False):
+    # Prefers the .br or .gz copy next to the file when the client takes it
+    path = safe_join(directory, filename)
+    if path is None:
+        abort(404)
+    max_age = ASSET_MAX_AGE if immutable else 0
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=max_age)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, max_age=max_age)
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    response.vary.add("Accept-Encoding")
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def zone_status(zone):
+    snapshot = zone.sampler.snapshot()
+    payload = build_status(zone, snapshot)
+    payload["age"] = snapshot.ages()
+    # Left out of the stream, where it would change every plug refresh
+    payload["plugs"] = zone.plugs.info(list(payload["plugs"]), confirmed=True)
+    return payload
+
+@app.route('/api/status', defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/status')
+def status(zone_name):
+    zone = zones.get(zone_name)
+    if zone is None:
+        return unknown_zone(zone_name)
+    return jsonify(zone_status(zone))
+
+@app.route('/api/zones')
+def get_zones():
+    # Status of every zone on this Pi
+    return jsonify({name: zone_status(zone) for name, zone in zones.items()})
+
+# --- Peer Aggregation ---
+# "Peers" in data.json maps names to the base URLs of other GrowPi backends,
+# e.g. {"veg-room": "http://192.168.1.51:5000"}. /api/aggregate fetches all
+# of them in parallel, so the slowest peer bounds the response time.
+PEER_TIMEOUT = 5
+
+def fetch_peer(url):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url.rstrip("/") + "/api/zones", timeout=PEER_TIMEOUT) as response:
+            result = {"zones": json.load(response)}
+    except Exception as e:
+        result = {"error": str(e)}
+    result["latency"] = round(time.perf_counter() - started, 3)
+    return result
+
+@app.route('/api/aggregate')
+def aggregate():
+    data = load_data()
+    peers = data.get("Peers", {})
+    node_name = data.get("Node Name") or socket.gethostname()
+    with ThreadPoolExecutor(max_workers=max(1, len(peers))) as pool:
+        futures = {name: pool.submit(fetch_peer, url) for name, url in peers.items()}
+        # This Pi's zones are collected while the peers answer
+        nodes = {node_name: {"zones": {name: zone_status(zone) for name, zone in zones.items()}, "latency": 0}}
+        for name, future in futures.items():
+            nodes[name] = future.result()
+    return jsonify(nodes)
+
+@app.route('/api/stream', defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/stream')
+def stream(zone_name):
+    # Server-Sent Events: the current status first, then only changed fields
+    zone = zones.get(zone_name)
+    if zone is None:
+        return unknown_zone(zone_name)
+    # Every open stream holds a server thread; leave the rest for requests
+    if sum(z.broadcaster.subscriber_count() for z in zones.values()) >= MAX_STREAMS:
+        return jsonify({"error": "Too many live streams"}), 503, {"Retry-After": str(STREAM_KEEPALIVE_SECONDS)}
+    q, initial = zone.broadcaster.subscribe()
+
+    def events():
+        try:
+            yield format_sse("status", initial)
+            while True:
+                try:
+                    delta = q.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse("delta", delta)
+        finally:
+            zone.broadcaster.unsubscribe(q)
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.route('/api/sensors', defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/sensors')
+def get_sensors(zone_name):
+    # Driver state: built or not, last init error and when it is retried
+    zone = zones.get(zone_name)
+    if zone is None:
+        return unknown_zone(zone_name)
+    return jsonify(zone.sensors.info())
+
+@app.route('/api/ready')
+def get_ready():
+    # 200 once the background startup phases have finished, 503 before;
+    # the body is the startup timing report either way
+    report = startup.report()
+    return jsonify(report), 200 if report["ready"] else 503
+
+@app.route('/api/scheduler')
+def get_scheduler():
+    return jsonify(scheduler.jobs())
+
+@app.route('/api/alerts')
+def get_alerts():
+    return jsonify(alerts.info())
+
+@app.route('/api/history', defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/history')
+def get_history(zone_name):
+    zone = zones.get(zone_name)
+    if zone is None:
+        return unknown_zone(zone_name)
+    metric = request.args.get("metric")
+    if metric not in HISTORY_METRICS:
+        return jsonify({"error": f"Unknown metric. Choose one of: {', '.join(HISTORY_METRICS)}"}), 400
+    end = request.args.get("to", default=time.time(), type=float)
+    start = request.args.get("from", default=end - 24 * 60 * 60, type=float)
+    step = request.args.get("step", type=float)
+    if start >= end:
+        return jsonify({"error": "'from' must be before 'to'."}), 400
+    if metric in STORED_METRICS:
+        points = history.query(zone.key(metric), start, end, step)
+    else:
+        points = derived_history(zone, metric, start, end, step)
+    return jsonify({
+        "metric": metric,
+        "from": start,
+        "to": end,
+        "points": points
     })
 
+@app.route('/api/export', defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/export')
+def export_history(zone_name):
+    # Streams readings, derived metrics and plug state changes as CSV (or
+    # Parquet/Arrow with pyarrow); see export.py
+    import export  # Loaded (with NumPy) on the first export, not at startup
+    zone = zones.get(zone_name)
+    if zone is None:
+        return unknown_zone(zone_name)
+    fmt = request.args.get("format", "csv")
+    if fmt not in export.formats():
+        needs = " (needs the pyarrow package)" if fmt in export.ENCODERS else ""
+        return jsonify({"error": f"Unsupported format{needs}. Choose one of: {', '.join(export.formats())}"}), 400
+    available = SENSOR_METRICS + list(derived.METRICS) + PLUG_METRICS
+    names = request.args.get("metrics", ",".join(available)).split(",")
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        return jsonify({"error": f"Unknown metrics {', '.join(unknown)}. Choose from: {', '.join(available)}"}), 400
+    end = request.args.get("to", default=time.time(), type=float)
+    start = request.args.get("from", default=end - 24 * 60 * 60, type=float)
+    if start >= end:
+        return jsonify({"error": "'from' must be before 'to'."}), 400
+    chunks = export.rows(
+        history, zone.key,
+        [name for name in names if name in SENSOR_METRICS],
+        [name for name in names if name in derived.METRICS],
+        [name for name in names if name in PLUG_METRICS],
+        derived.settings(zone_data(zone)), start, end
+    )
+    span = "-".join(datetime.datetime.fromtimestamp(ts).strftime("%Y%m%d") for ts in (start, end))
+    filename = f"growpi-{zone.name}-{span}.{fmt}"
+    return Response(export.ENCODERS[fmt](chunks), mimetype=export.MIMETYPES[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
 @app.route('/')
 def serve_frontend():
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_static(app.static_folder, 'index.html')
 
 @app.route('/assets/<path:path>')
 def serve_assets(path):
-    return send_from_directory(os.path.join(app.static_folder, 'assets'), path)
+    return send_static(os.path.join(app.static_folder, 'assets'), path, immutable=True)
 
 @app.route('/favicon.ico')
 def serve_favicon():
-    return send_from_directory(app.static_folder, 'favicon.ico')
-
-@app.route('/meters')
-def get_meters():
+    return send_static(app.static_folder, 'favicon.ico')
+
+@app.route('/meters', defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/meters')
+def get_meters(zone_name):
+    zone = zones.get(zone_name)
+    if zone is None:
+        return unknown_zone(zone_name)
+    snapshot = zone.sampler.snapshot()
     return jsonify({
         "Air Temperature": {
-            "value": safe_read(temp_sensor, "read_temp", temp_error or sensor_errors.get("temperature", "Temperature sensor not available")),
-            "unit": "°F"
+            "value": snapshot.value("temperature"),
+            "unit": "°F",
+            "age": snapshot.age("temperature")
         },
         "Relative Humidity": {
-            "value": safe_read(rh_sensor, "read_rh", rh_error or sensor_errors.get("humidity", "Humidity sensor not available")),
-            "unit": "%"
+            "value": snapshot.value("humidity"),
+            "unit": "%",
+            "age": snapshot.age("humidity")
         },
         "Water Temperature": {
-            "value": safe_read(wtemp_sensor, "read_temp", wtemp_error or sensor_errors.get("water_temperature", "Water temperature sensor not available")),
-            "unit": "°F"
+            "value": snapshot.value("water_temperature"),
+            "probes": snapshot.value("water_probes"),
+            "unit": "°F",
+            "age": snapshot.age("water_temperature")
         },
         "Water pH": {
-            "value": safe_read(ph_sensor, "read_ph", ph_error or sensor_errors.get("ph", "pH sensor not available")),
-            "unit": "pH"
+            "value": snapshot.value("ph"),
+            "noise": snapshot.value("ph_noise"),
+            "unit": "pH",
+            "age": snapshot.age("ph")
         }
     })
 
-@app.route('/controls', methods=['POST'])
-def controls():
-    actions = run_climate_and_light_control()
-    temp_val = safe_read(temp_sensor, "read_temp", temp_error or sensor_errors.get("temperature", "Temperature sensor not available"))
-    rh_val = safe_read(rh_sensor, "read_rh", rh_error or sensor_errors.get("humidity", "Humidity sensor not available"))
+@app.route('/controls', methods=['POST'], defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/controls', methods=['POST'])
+def controls(zone_name):
+    zone = zones.get(zone_name)
+    if zone is None:
+        return unknown_zone(zone_name)
+    actions = run_climate_and_light_control(zone)
+    snapshot = zone.sampler.snapshot()
     return jsonify({
-        "temperature": temp_val,
-        "humidity": rh_val,
+        "temperature": snapshot.value("temperature"),
+        "humidity": snapshot.value("humidity"),
         "actions": actions
     })
 
 @app.route('/get', methods=['GET'])
 def get_data():
-    data = load_data()
-    return jsonify(data)
-
-@app.route('/set', methods=['POST'])
-def set_ideal_ranges():
+    return config_json("get", load_data)
+
+@app.route('/api/zones/<zone_name>/config')
+def get_zone_config(zone_name):
+    # The effective settings of one zone (top level merged with its overrides)
+    if zone_name not in zones:
+        return unknown_zone(zone_name)
+    def build():
+        data = zone_config(load_data(), zone_name)
+        return {key: value for key, value in data.items() if key != "Zones"}
+    return config_json(("config", zone_name), build)
+
+# --- Batched Config Updates ---
+# Settings that change what the climate/light job would decide right now
+CONTROL_SETTINGS = ["State", "Ideal Ranges", "Light Schedule", "Units", "Kasa configs"]
+
+@app.route('/api/config', methods=['PATCH'])
+def patch_config():
+    # Applies a list of JSON Patch operations (see config_patch.py) in one
+    # atomic, validated write. Send the ETag from /get as If-Match to have
+    # the batch rejected with 412 if the config changed since it was read.
+    operations = request.get_json(force=True, silent=True)
+    with config.edit() as data:
+        tag = config_etag()
+        if request.if_match and not request.if_match.contains_weak(tag):
+            return jsonify({"error": "Config has changed; reload it and retry."}), 412, {"ETag": f'W/"{tag}"'}
+        try:
+            patched = apply_patch(data, operations)
+        except PatchError as e:
+            return jsonify({"error": str(e)}), 400
+        # Only problems the batch introduces; an old hand-edited quirk
+        # elsewhere in the file shouldn't block unrelated changes
+        existing = set(validate(data))
+        errors = [error for error in validate(patched) if error not in existing]
+        if errors:
+            return jsonify({"error": "Invalid config", "details": errors}), 422
+        previous = dict(data)
+        data.clear()
+        data.update(patched)
+        version = config.save(data)
+        tag = config_etag()
+
+    # Apply the changes the way the individual /set routes do
+    for name, zone in zones.items():
+        if name != DEFAULT_ZONE and not (name in previous.get("Zones", {}) and name in patched.get("Zones", {})):
+            continue
+        before = zone_config(previous, name)
+        after = zone_config(patched, name)
+        changed = {key for key in set(before) | set(after) if before.get(key) != after.get(key)}
+        configure_zone_sensors(zone)
+        if "Sampling Intervals" in changed:
+            apply_sampling_intervals(zone)
+        if changed & set(CONTROL_SETTINGS):
+            scheduler.reschedule(zone.job("climate_control"))
+    if previous.get("Notification Settings") != patched.get("Notification Settings"):
+        configure_alerts(patched)
+
+    response = jsonify({
+        "version": version,
+        # Zones are created at startup
+        "restart_required": zone_names(previous) != zone_names(patched)
+    })
+    response.set_etag(tag, weak=True)
+    return response
+
+@app.route('/set', methods=['POST'], defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/ranges', methods=['POST'])
+def set_ideal_ranges(zone_name):
+    if zone_name not in zones:
+        return unknown_zone(zone_name)
     payload = request.json
     stage = payload.get("stage")
     meter = payload.get("meter")
     subkey = payload.get("subkey")
     values = payload.get("values")
 
-    data = load_data()
-    if stage in data["Ideal Ranges"]:
-        if meter in data["Ideal Ranges"][stage]:
-            if isinstance(data["Ideal Ranges"][stage][meter], dict) and subkey:
-                if subkey in data["Ideal Ranges"][stage][meter]:
-                    data["Ideal Ranges"][stage][meter][subkey].update(values)
-            else:
-                data["Ideal Ranges"][stage][meter].update(values)
-    save_data(data)
-    return jsonify(data["Ideal Ranges"][stage])
-
-@app.route('/set_Pins', methods=['POST'])
-def set_pins():
+    with config.edit() as data:
+        ranges = zone_section(data, zone_name, "Ideal Ranges")
+        if stage in ranges:
+            if meter in ranges[stage]:
+                if isinstance(ranges[stage][meter], dict) and subkey:
+                    if subkey in ranges[stage][meter]:
+                        ranges[stage][meter][subkey].update(values)
+                else:
+                    ranges[stage][meter].update(values)
+        return jsonify(ranges[stage])
+
+@app.route('/set_Pins', methods=['POST'], defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/pins', methods=['POST'])
+def set_pins(zone_name):
+    zone = zones.get(zone_name)
+    if zone is None:
+        return unknown_zone(zone_name)
     new_pins = request.json
-    data = load_data()
-    for sensor, pin in new_pins.items():
-        if sensor in data["Sensor Pins"]:
-            data["Sensor Pins"][sensor] = pin
-    save_data(data)
-    pins = data["Sensor Pins"]
-    global temp_sensor, rh_sensor, wtemp_sensor, ph_sensor, temp_error, rh_error, wtemp_error, ph_error
-    sensor_errors.clear()
-    temp_sensor, temp_error = safe_init(temp.TemperatureSensor, name="temperature")
-    rh_sensor, rh_error = safe_init(rh.RHMeter, name="humidity")
-    wtemp_sensor, wtemp_error = safe_init(wtemp.WaterTemperatureSensor, name="water_temperature")
-    ph_cal = data.get("PH Calibration", {"slope": -5.6548, "intercept": 15.509})
-    ph_sensor, ph_error = safe_init(
-        ph.PHMeter,
-        pins["Water pH Sensor"],
-        ph_cal["slope"],
-        ph_cal["intercept"],
-        name="ph"
-    )
-    return jsonify({"message": "Pins updated and sensors re-initialized."})
-
-@app.route('/set_Kasa', methods=['POST'])
-def set_kasa():
+    with config.edit() as data:
+        pins = zone_section(data, zone_name, "Sensor Pins")
+        for sensor, pin in new_pins.items():
+            if sensor in pins:
+                pins[sensor] = pin
+    changed = configure_zone_sensors(zone)
+    return jsonify({"message": "Pins updated.", "reinitialized": changed})
+
+@app.route('/set_Kasa', methods=['POST'], defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/kasa', methods=['POST'])
+def set_kasa(zone_name):
+    if zone_name not in zones:
+        return unknown_zone(zone_name)
     new_kasa = request.json
-    data = load_data()
-    if "Kasa configs" in data:
-        data["Kasa configs"].update(new_kasa)
-    save_data(data)
-    return jsonify({"message": "Kasa configuration updated successfully."})
+    with config.edit() as data:
+        if "Kasa configs" in data:
+            zone_section(data, zone_name, "Kasa configs").update(new_kasa)
+        return jsonify({"message": "Kasa configuration updated successfully."})
 
 @app.route('/find_kasa', methods=['GET'])
 def find_kasa():
+    # Answers from the cached alias map; a stale map is refreshed in the
+    # background. Only the first scan (or ?refresh=1) waits for discovery.
     data = load_data()
-    user = data["Kasa configs"]["Username"]
-    pwd = data["Kasa configs"]["Password"]
+    kasa = data["Kasa configs"]
+    user = kasa["Username"]
+    pwd = kasa["Password"]
     try:
-        fan_ip = asyncio.run(plug.get_Device_IP(user, pwd, "Fan"))
-        light_ip = asyncio.run(plug.get_Device_IP(user, pwd, "Light"))
-        humidifier_ip = asyncio.run(plug.get_Device_IP(user, pwd, "Humidifier"))
-        return jsonify({
-            "Fan": fan_ip,
-            "Light": light_ip,
-            "Humidifier": humidifier_ip
-        })
+        if kasa_directory.timestamp == 0 or request.args.get("refresh") == "1":
+            kasa_loop.run(kasa_directory.refresh(user, pwd), timeout=DISCOVERY_TIMEOUT)
+        elif kasa_directory.is_stale(time.time()):
+            kasa_loop.submit(kasa_directory.refresh(user, pwd))
+    except TimeoutError:
+        # The scan is shared and keeps running; the next request picks it up
+        return jsonify({"error": "Discovery is still running, try again shortly."}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-
-@app.route('/set_stage', methods=['POST'])
-def set_stage():
+    roles = PLUG_ROLES + [name for name in kasa["Device_IPs"] if name not in PLUG_ROLES]
+    return jsonify({role: kasa_directory.aliases.get(role) for role in roles})
+
+@app.route('/set_stage', methods=['POST'], defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/stage', methods=['POST'])
+def set_stage(zone_name):
+    if zone_name not in zones:
+        return unknown_zone(zone_name)
     payload = request.json
     stage = payload.get("stage")
-    data = load_data()
-    if stage and stage in data["Ideal Ranges"]:
-        data["State"]["Current Stage"] = stage
-        save_data(data)
-        return jsonify({"message": f"Stage set to {stage}."})
-    return jsonify({"error": "Invalid stage."}, 400)
-
-@app.route('/light_schedule', methods=['GET'])
-def get_light_schedule():
-    data = load_data()
+    with config.edit() as data:
+        if stage and stage in zone_config(data, zone_name)["Ideal Ranges"]:
+            zone_section(data, zone_name, "State")["Current Stage"] = stage
+            return jsonify({"message": f"Stage set to {stage}."})
+        return jsonify({"error": "Invalid stage."}, 400)
+
+@app.route('/light_schedule', methods=['GET'], defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/light_schedule', methods=['GET'])
+def get_light_schedule(zone_name):
+    if zone_name not in zones:
+        return unknown_zone(zone_name)
+    data = zone_config(load_data(), zone_name)
     return jsonify(data.get("Light Schedule", {}))
 
-@app.route('/light_schedule', methods=['POST'])
-def set_light_schedule():
+@app.route('/light_schedule', methods=['POST'], defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/light_schedule', methods=['POST'])
+def set_light_schedule(zone_name):
+    zone = zones.get(zone_name)
+    if zone is None:
+        return unknown_zone(zone_name)
     print("Received POST to /light_schedule")
     payload = request.json
-    data = load_data()
-    data["Light Schedule"] = {
-        "on": payload["on"],
-        "off": payload["off"]
-    }
-    save_data(data)
+    with config.edit() as data:
+        sched = zone_section(data, zone_name, "Light Schedule")
+        sched.clear()
+        sched.update({
+            "on": payload["on"],
+            "off": payload["off"]
+        })
+    scheduler.reschedule(zone.job("climate_control"))
     return jsonify({"message": "Light schedule updated."})
 
-@app.route('/ph_calibration', methods=['GET'])
-def get_ph_calibration():
-    data = load_data()
-    return jsonify(data.get("PH Calibration", {}))
-
-@app.route('/ph_calibration', methods=['POST'])
-def set_ph_calibration():
+@app.route('/ph_calibration', methods=['GET'], defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/ph_calibration', methods=['GET'])
+def get_ph_calibration(zone_name):
+    if zone_name not in zones:
+        return unknown_zone(zone_name)
+    return config_json(("ph_calibration", zone_name),
+                       lambda: zone_config(load_data(), zone_name).get("PH Calibration", {}))
+
+@app.route('/ph_calibration', methods=['POST'], defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/ph_calibration', methods=['POST'])
+def set_ph_calibration(zone_name):
+    zone = zones.get(zone_name)
+    if zone is None:
+        return unknown_zone(zone_name)
     payload = request.json
     slope = payload.get("slope")
     intercept = payload.get("intercept")
-    data = load_data()
     if slope is not None and intercept is not None:
-        data["PH Calibration"] = {"slope": slope, "intercept": intercept}
-        save_data(data)
-        # Re-initialize pH sensor with new calibration
-        pins = data["Sensor Pins"]
-        global ph_sensor, ph_error
-        ph_sensor, ph_error = safe_init(
-            ph.PHMeter,
-            pins["Water pH Sensor"],
-            slope,
-            intercept,
-            name="ph"
-        )
+        with config.edit() as data:
+            cal = zone_section(data, zone_name, "PH Calibration")
+            cal.clear()
+            cal.update({"slope": slope, "intercept": intercept})
+        configure_zone_sensors(zone)
         return jsonify({"message": "Calibration updated."})
     return jsonify({"error": "Missing slope or intercept."}, 400)
 
-@app.route('/ph_calibration_point', methods=['POST'])
-def ph_calibration_point():
-    global ph_sensor, ph_error
+@app.route('/ph_calibration_point', methods=['POST'], defaults={"zone_name": DEFAULT_ZONE})
+@app.route('/api/zones/<zone_name>/ph_calibration_point', methods=['POST'])
+def ph_calibration_point(zone_name):
+    zone = zones.get(zone_name)
+    if zone is None:
+        return unknown_zone(zone_name)
     payload = request.json
     known_ph = payload.get("known_ph")
-    data = load_data()
-    pins = data["Sensor Pins"]
-    ph_adc = MCP3008(channel=pins["Water pH Sensor"])
-    voltage = ph_adc.value * 3.3
-    cal_points = data.setdefault("PH Calibration Points", [])
-    cal_points.append({"ph": known_ph, "voltage": voltage})
-
-    if len(cal_points) == 2:
-        # Linear calibration (2-point)
-        p1, p2 = cal_points
-        slope = (p1["ph"] - p2["ph"]) / (p1["voltage"] - p2["voltage"])
-        intercept = p1["ph"] - slope * p1["voltage"]
-        data["PH Calibration"] = {"type": "linear", "slope": slope, "intercept": intercept}
-        data["PH Calibration Points"] = []
-        save_data(data)
-        ph_sensor, ph_error = safe_init(
-            ph.PHMeter,
-            pins["Water pH Sensor"],
-            slope,
-            intercept,
-            name="ph"
-        )
-        return jsonify({"message": f"2-point calibration complete! Slope: {slope:.4f}, Intercept: {intercept:.4f}"})
-    elif len(cal_points) == 3:
-        # Quadratic calibration (3-point)
-        import numpy as np
-        v = np.array([p["voltage"] for p in cal_points])
-        phs = np.array([p["ph"] for p in cal_points])
-        # Fit quadratic: ph = a*v^2 + b*v + c
-        coeffs = np.polyfit(v, phs, 2)
-        a, b, c = coeffs
-        data["PH Calibration"] = {"type": "quadratic", "a": a, "b": b, "c": c}
-        data["PH Calibration Points"] = []
-        save_data(data)
-        ph_sensor, ph_error = safe_init(
-            ph.PHMeter,
-            pins["Water pH Sensor"],
-            a,
-            b,
-            c,
-            name="ph"
-        )
-        return jsonify({"message": f"3-point calibration complete! a: {a:.6f}, b: {b:.6f}, c: {c:.6f}"})
-    else:
-        save_data(data)
-        return jsonify({"message": f"Calibration point saved. Please add {2 - len(cal_points) if len(cal_points) < 2 else 3 - len(cal_points)} more point(s)."})
+    sensor, error = zone.sensors.get("ph")
+    if sensor is None:
+        return jsonify({"error": f"pH sensor not available: {error}"}), 503
+    voltage = sensor.read_filtered_voltage()
+    with config.edit() as data:
+        # Calibration is stored with the zone that owns the probe
+        owner = data if zone_name == DEFAULT_ZONE else data["Zones"][zone_name]
+        cal_points = owner.setdefault("PH Calibration Points", [])
+        cal_points.append({"ph": known_ph, "voltage": voltage})
+
+        if len(cal_points) == 2:
+            # Linear calibration (2-point)
+            p1, p2 = cal_points
+            slope = (p1["ph"] - p2["ph"]) / (p1["voltage"] - p2["voltage"])
+            intercept = p1["ph"] - slope * p1["voltage"]
+            owner["PH Calibration"] = {"type": "linear", "slope": slope, "intercept": intercept}
+            owner["PH Calibration Points"] = []
+            message = f"2-point calibration complete! Slope: {slope:.4f}, Intercept: {intercept:.4f}"
+        elif len(cal_points) == 3:
+            # Quadratic calibration (3-point)
+            import numpy as np
+            v = np.array([p["voltage"] for p in cal_points])
+            phs = np.array([p["ph"] for p in cal_points])
+            # Fit quadratic: ph = a*v^2 + b*v + c
+            coeffs = np.polyfit(v, phs, 2)
+            a, b, c = (float(coeff) for coeff in coeffs)
+            owner["PH Calibration"] = {"type": "quadratic", "a": a, "b": b, "c": c}
+            owner["PH Calibration Points"] = []
+            message = f"3-point calibration complete! a: {a:.6f}, b: {b:.6f}, c: {c:.6f}"
+        else:
+            return jsonify({"message": f"Calibration point saved. Please add {2 - len(cal_points) if len(cal_points) < 2 else 3 - len(cal_points)} more point(s)."})
+    configure_zone_sensors(zone)
+    return jsonify({"message": message})
+
+TEMPERATURE_RANGES = ("Air Temperature", "Water Temperature") + tuple(
+    metric.range_key for metric in derived.METRICS.values() if metric.unit == "temperature")
+
+def convert_temperature_ranges(sections, convert):
+    # Converts every temperature bound in the given Ideal Ranges sections in
+    # one vectorized call; other meters (RH, VPD, pH) are left alone
+    bounds = []
+    for ranges in sections:
+        for meters in ranges.values():
+            for meter in TEMPERATURE_RANGES:
+                value = meters.get(meter)
+                if not isinstance(value, dict):
+                    continue
+                # Air Temperature nests a range per light state
+                for entry in [value] if "min" in value else value.values():
+                    if isinstance(entry, dict):
+                        bounds += [(entry, key) for key in ("min", "max", "target") if key in entry]
+    if not bounds:
+        return
+    import numpy as np
+    converted = np.round(convert(np.array([entry[key] for entry, key in bounds], dtype=float)), 2)
+    for (entry, key), value in zip(bounds, converted.tolist()):
+        entry[key] = value
+
+def zone_temperature_unit(data, name):
+    return zone_config(data, name).get("Units", {}).get("Temperature", "F")
+
 @app.route('/set_units', methods=['POST'])
 def set_units():
     units = request.json
-    data = load_data()
-    prev_units = data.get("Units", {})
-    # Convert temperature ranges if unit changed
-    if "Temperature" in units and units["Temperature"] != prev_units.get("Temperature"):
-        from_F = units["Temperature"] == "C" and prev_units.get("Temperature") == "F"
-        from_C = units["Temperature"] == "F" and prev_units.get("Temperature") == "C"
-        for stage, meters in data.get("Ideal Ranges", {}).items():
-            for meter, value in meters.items():
-                # Handle nested (e.g. Air Temperature with Lights On/Off)
-                if isinstance(value, dict) and "min" in value and "max" in value and "target" in value:
-                    if from_F:
-                        value["min"] = round((value["min"] - 32) * 5/9, 2)
-                        value["max"] = round((value["max"] - 32) * 5/9, 2)
-                        value["target"] = round((value["target"] - 32) * 5/9, 2)
-                    elif from_C:
-                        value["min"] = round(value["min"] * 9/5 + 32, 2)
-                        value["max"] = round(value["max"] * 9/5 + 32, 2)
-                        value["target"] = round(value["target"] * 9/5 + 32, 2)
-                # Handle Air Temperature with Lights On/Off
-                elif isinstance(value, dict):
-                    for subkey, subval in value.items():
-                        if isinstance(subval, dict) and "min" in subval and "max" in subval and "target" in subval:
-                            if from_F:
-                                subval["min"] = round((subval["min"] - 32) * 5/9, 2)
-                                subval["max"] = round((subval["max"] - 32) * 5/9, 2)
-                                subval["target"] = round((subval["target"] - 32) * 5/9, 2)
-                            elif from_C:
-                                subval["min"] = round(subval["min"] * 9/5 + 32, 2)
-                                subval["max"] = round(subval["max"] * 9/5 + 32, 2)
-                                subval["target"] = round(subval["target"] * 9/5 + 32, 2)
-    # Convert light schedule if time format changed
-    if "Time" in units and units["Time"] != prev_units.get("Time"):
-        sched = data.get("Light Schedule", {})
-        if "on" in sched and "off" in sched:
-            if units["Time"] == "24h":
-                # Convert from 12h to 24h
-                sched["on"] = to_24h(sched["on"])
-                sched["off"] = to_24h(sched["off"])
-            else:
-                # Convert from 24h to 12h
-                sched["on"] = to_12h(sched["on"])
-                sched["off"] = to_12h(sched["off"])
-            data["Light Schedule"] = sched
-    data["Units"] = units
-    save_data(data)
+    with config.edit() as data:
+        prev_units = data.get("Units", {})
+        # A zone can override Units, so only the zones whose effective
+        # temperature unit changes get their own ranges converted
+        prev_temp = {name: zone_temperature_unit(data, name) for name in zone_names(data)}
+        # Convert light schedule if time format changed
+        if "Time" in units and units["Time"] != prev_units.get("Time"):
+            sched = data.get("Light Schedule", {})
+            if "on" in sched and "off" in sched:
+                if units["Time"] == "24h":
+                    # Convert from 12h to 24h
+                    sched["on"] = to_24h(sched["on"])
+                    sched["off"] = to_24h(sched["off"])
+                else:
+                    # Convert from 24h to 12h
+                    sched["on"] = to_12h(sched["on"])
+                    sched["off"] = to_12h(sched["off"])
+                data["Light Schedule"] = sched
+        data["Units"] = units
+        for unit, convert, scale in (("C", derived.f_to_c, 5 / 9), ("F", derived.c_to_f, 9 / 5)):
+            changed = [name for name in prev_temp
+                       if prev_temp[name] != unit and zone_temperature_unit(data, name) == unit]
+            owners = [data if name == DEFAULT_ZONE else data["Zones"][name] for name in changed]
+            convert_temperature_ranges([owner.get("Ideal Ranges", {}) for owner in owners], convert)
+            # The leaf offset is a temperature difference: scale, don't shift
+            for owner in owners:
+                options = owner.get("Derived Metrics", {})
+                if isinstance(options.get("leaf_temperature_offset"), (int, float)):
+                    options["leaf_temperature_offset"] = round(options["leaf_temperature_offset"] * scale, 2)
+    for zone in zones.values():
+        scheduler.reschedule(zone.job("climate_control"))
     return jsonify({"message": "Units updated and config converted."})
 
+# --- Startup ---
+# Everything above only reads config and wires things together, so the HTTP
+# server can start right away. Hardware, plugs and background threads come
+# up in these phases; /api/ready reports their progress and timing.
+SAMPLER_READY_TIMEOUT = 15  # Seconds to wait for each zone's first readings
+
+def build_sensors():
+    unavailable = {}
+    for zone in zones.values():
+        for name in sensor_specs(zone_data(zone)):
+            sensor, error = zone.sensors.get(name)
+            if sensor is None:
+                unavailable[zone.key(name)] = error
+    return {"unavailable": unavailable} if unavailable else None
+
+def start_sampling():
+    for zone in zones.values():
+        zone.sampler.start()
+    for zone in zones.values():
+        zone.sampler.wait_ready(timeout=SAMPLER_READY_TIMEOUT)
+
+def connect_plugs():
+    # Imports python-kasa and opens a pooled connection to every configured
+    # plug, which also fills the state cache the dashboard reads
+    plug.preload()
+    answered = total = 0
+    for zone in zones.values():
+        device_ips = zone_data(zone)["Kasa configs"]["Device_IPs"]
+        names = [name for name, ip in device_ips.items() if ip]
+        kasa_loop.run(refresh_plugs(zone, device_ips), timeout=PLUG_TIMEOUT + 1)
+        total += len(names)
+        answered += sum(entry["on"] is not None for entry in zone.plugs.info(names).values())
+    return {"answered": answered, "plugs": total}
+
+def start_jobs():
+    alerts.start()
+    scheduler.start()
+
+startup.mark("routes")
+startup.run_background([
+    ("history", history.start),
+    ("sensors", build_sensors),
+    ("sampling", start_sampling),
+    ("plugs", connect_plugs),
+    ("jobs", start_jobs)
+])
+
+# --- Shutdown ---
+# Config saves reach data.json up to ConfigStore.write_delay seconds late
+# and samples reach history.db every HistoryStore.flush_interval seconds,
+# so whatever is still pending is written out on exit. restart.sh stops
+# the backend with SIGTERM, which skips atexit unless it is turned into a
+# normal exit first.
+def flush_on_exit():
+    try:
+        config.flush()
+    except Exception as e:
+        print(f"Config flush error on shutdown: {e}")
+    try:
+        history.flush()
+    except Exception as e:
+        print(f"History flush error on shutdown: {e}")
+
+def exit_on_sigterm(signum, frame):
+    sys.exit(0)  # waitress stops serving on SystemExit; atexit runs after
+
+atexit.register(flush_on_exit)
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    # waitress serves from a fixed pool of SERVER_THREADS threads. Plug and
+    # sensor I/O runs on the Kasa loop and the samplers, and every route
+    # waits for it with a bounded timeout, so a slow device costs a request
+    # at most that timeout and never blocks the rest of the dashboard.
+    from waitress import serve
+    signal.signal(signal.SIGTERM, exit_on_sigterm)
+    print(f"Serving on port {SERVER_PORT} with {SERVER_THREADS} threads")
+    serve(app, host="0.0.0.0", port=SERVER_PORT, threads=SERVER_THREADS,
+          connection_limit=SERVER_CONNECTION_LIMIT, channel_timeout=SERVER_CHANNEL_TIMEOUT)
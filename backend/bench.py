@@ -0,0 +1,243 @@
+import argparse
+import http.client
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Hardware-free benchmark for the GrowPi backend.
+#
+# Runs the whole app against the simulated sensors and the Kasa stand-in
+# (GROWPI_SIM=1) with a throwaway config and history database, then reports:
+#
+#   - import time (until HTTP can be served) and time until /api/ready
+#   - /api/status throughput and latency over real HTTP
+#   - climate/light control cycle duration, with and without plug switching
+#     and over pooled or fresh plug connections
+#   - config write throughput (debounced edits and durable writes)
+#
+# Usage: python bench.py [--requests N] [--concurrency N] [--cycles N]
+#                        [--config-writes N] [--plug-latency S]
+#                        [--sensor-latency-scale X] [--failure-rate F] [--json]
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(seconds):
+    return {
+        "count": len(seconds),
+        "mean_ms": round(sum(seconds) / len(seconds) * 1000, 3) if seconds else None,
+        "p50_ms": round(percentile(seconds, 50) * 1000, 3) if seconds else None,
+        "p99_ms": round(percentile(seconds, 99) * 1000, 3) if seconds else None,
+        "max_ms": round(max(seconds) * 1000, 3) if seconds else None
+    }
+
+
+def prepare_environment(workdir, args):
+    # Point the app at a scratch config wired to the stand-in Kasa plugs
+    os.environ["GROWPI_SIM"] = "1"
+    os.environ["GROWPI_SIM_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["GROWPI_SIM_LATENCY_SCALE"] = str(args.sensor_latency_scale)
+    data_file = os.path.join(workdir, "data.json")
+    with open(os.path.join(BACKEND_DIR, "data.json.example")) as f:
+        data = json.load(f)
+    from controls import sim_plug
+    data["Kasa configs"]["Device_IPs"] = sim_plug.device_ips()
+    with open(data_file, "w") as f:
+        json.dump(data, f, indent=2)
+    os.environ["GROWPI_DATA_FILE"] = data_file
+    os.environ["GROWPI_HISTORY_FILE"] = os.path.join(workdir, "history.db")
+
+    from meters import sim
+    # Plug latency is absolute; the scale only applies to the sensor buses
+    sim.configure("plug", latency=args.plug_latency, jitter=0, scale=1.0)
+
+
+def bench_status(app, requests, concurrency, threads):
+    # Served the way app.py serves it in production: waitress with the same
+    # worker thread count
+    from waitress import create_server
+
+    server = create_server(app, host="127.0.0.1", port=0, threads=threads)
+    port = server.effective_port
+    serving = threading.Thread(target=server.run, name="bench-http", daemon=True)
+    serving.start()
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def fetch():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        try:
+            conn.request("GET", "/api/status")
+            response = conn.getresponse()
+            response.read()
+            return response.status == 200
+        finally:
+            conn.close()
+
+    def client():
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            started = time.perf_counter()
+            try:
+                ok = fetch()
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+
+    for _ in range(min(50, requests)):
+        fetch()
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    # Closed from the server's own loop, which then runs out of sockets and returns
+    server.trigger.pull_trigger(server.close)
+    serving.join(5)
+    server.task_dispatcher.shutdown()
+
+    result = summarize(latencies)
+    result.update({
+        "concurrency": concurrency,
+        "threads": threads,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "errors": errors[0]
+    })
+    return result
+
+
+def bench_control(app_module, cycles):
+    # Plug commands go through controls/plug.py (pool, retries, Kasa loop)
+    # to the stand-in devices in controls/sim_plug.py. "switching" forgets
+    # the known plug states first, so every plug gets a command over its
+    # pooled connection; "reconnect" also empties the pool, so every command
+    # pays the connect handshake first; "steady" runs with everything
+    # already in the desired state. `connections` counts the handshakes;
+    # `errors` the cycles that raised (a failed sensor read, with
+    # --failure-rate), as the scheduler would have logged them.
+    from controls import plug, sim_plug
+    timings = {"switching": [], "reconnect": [], "steady": []}
+    connections = dict.fromkeys(timings, 0)
+    errors = dict.fromkeys(timings, 0)
+
+    def run(kind):
+        before = sim_plug.connect_count
+        started = time.perf_counter()
+        try:
+            app_module.run_climate_and_light_control()
+        except Exception:
+            errors[kind] += 1
+        timings[kind].append(time.perf_counter() - started)
+        connections[kind] += sim_plug.connect_count - before
+
+    for _ in range(cycles):
+        app_module.main_zone.plugs.clear()
+        run("switching")
+        run("steady")
+        app_module.main_zone.plugs.clear()
+        app_module.kasa_loop.run(plug.close_all(), timeout=10)
+        run("reconnect")
+    return {kind: {**summarize(seconds), "connections": connections[kind], "errors": errors[kind]}
+            for kind, seconds in timings.items()}
+
+
+def bench_config(workdir, writes):
+    from config_store import ConfigStore
+    path = os.path.join(workdir, "config-bench.json")
+    shutil.copy(os.environ["GROWPI_DATA_FILE"], path)
+    store = ConfigStore(path, write_delay=3600)
+
+    started = time.perf_counter()
+    for i in range(writes):
+        with store.edit() as data:
+            data["Bench Counter"] = i
+    edits = writes / (time.perf_counter() - started)
+
+    durable = []
+    for i in range(writes):
+        started = time.perf_counter()
+        with store.edit() as data:
+            data["Bench Counter"] = -i
+        store.flush()
+        durable.append(time.perf_counter() - started)
+    result = summarize(durable)
+    result.update({
+        "edits_per_second": round(edits, 1),
+        "durable_writes_per_second": round(len(durable) / sum(durable), 1)
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the GrowPi backend on simulated hardware")
+    parser.add_argument("--requests", type=int, default=2000, help="/api/status requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent HTTP clients")
+    parser.add_argument("--cycles", type=int, default=20, help="control cycles of each kind")
+    parser.add_argument("--config-writes", type=int, default=200, help="config edits of each kind")
+    parser.add_argument("--plug-latency", type=float, default=0.05, help="simulated plug round trip, seconds")
+    parser.add_argument("--sensor-latency-scale", type=float, default=1.0, help="multiplier for simulated bus latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of simulated I/O calls that fail")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    workdir = tempfile.mkdtemp(prefix="growpi-bench-")
+    try:
+        prepare_environment(workdir, args)
+        started = time.perf_counter()
+        import app as app_module
+        startup = time.perf_counter() - started
+        app_module.startup.wait(timeout=60)
+        ready = time.perf_counter() - started
+
+        results = {
+            "startup_seconds": round(startup, 3),
+            "ready_seconds": round(ready, 3),
+            "status": bench_status(app_module.app, args.requests, args.concurrency, app_module.SERVER_THREADS),
+            "control_cycle": bench_control(app_module, args.cycles),
+            "config_write": bench_config(workdir, args.config_writes)
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    status = results["status"]
+    print(f"startup             {results['startup_seconds'] * 1000:.1f} ms to serve, "
+          f"{results['ready_seconds'] * 1000:.1f} ms to ready")
+    print(f"/api/status         {status['requests_per_second']} req/s with {status['concurrency']} clients, "
+          f"p50 {status['p50_ms']} ms, p99 {status['p99_ms']} ms, errors {status['errors']}")
+    for kind, cycle in results["control_cycle"].items():
+        print(f"control ({kind:9}) p50 {cycle['p50_ms']} ms, p99 {cycle['p99_ms']} ms, max {cycle['max_ms']} ms, "
+              f"{cycle['connections']} plug connections, errors {cycle['errors']}")
+    config = results["config_write"]
+    print(f"config writes       {config['edits_per_second']} edits/s, {config['durable_writes_per_second']} durable writes/s "
+          f"(p99 {config['p99_ms']} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+# Response compression for the API. Brotli is preferred when the brotli
+# package is installed and the client accepts it.
+
+ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+MIN_SIZE = 512  # Smaller bodies aren't worth the CPU or the extra header
+COMPRESSIBLE = {"application/json", "text/plain", "text/csv", "text/html", "application/javascript", "text/css"}
+
+
+def choose_encoding(accept_encodings):
+    # Best encoding the client accepts (werkzeug's request.accept_encodings), or None
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+class VariantCache:
+    # Serialized bodies keyed by name, each valid for one tag (the config
+    # version). Compressed variants are made on first request and reused
+    # until the tag changes.
+
+    def __init__(self):
+        self._entries = {}
+
+    def body(self, key, tag, build, encoding=None):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != tag:
+            entry = (tag, {None: build()})
+            self._entries[key] = entry
+        variants = entry[1]
+        if encoding not in variants:
+            variants[encoding] = compress(variants[None], encoding)
+        return variants[encoding]
@@ -0,0 +1,256 @@
+import copy
+import re
+
+from zones import zone_config, zone_names
+
+# Batched config edits for PATCH /api/config. A patch is a list of
+# operations in the style of JSON Patch (RFC 6902):
+#
+#   [{"op": "replace", "path": "/Light Schedule/on", "value": "05:00"},
+#    {"op": "add", "path": "/Kasa configs/Device_IPs/Heater", "value": "192.168.1.62"},
+#    {"op": "remove", "path": "/Kasa configs/Device_IPs/Dehumidifier"},
+#    {"op": "test", "path": "/State/Current Stage", "value": "Vegetative"}]
+#
+# Paths are JSON pointers (RFC 6901: "~1" is "/", "~0" is "~"). The
+# operations are applied in order to a copy of the config and the result
+# is validated against SCHEMA; any failure rejects the whole batch.
+
+OPS = ("add", "remove", "replace", "test")
+
+
+class PatchError(ValueError):
+    pass
+
+
+def parse_pointer(path):
+    if not isinstance(path, str) or (path and not path.startswith("/")):
+        raise PatchError(f"Invalid path {path!r}")
+    if not path:
+        return []
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _index(container, token, path, append=False):
+    # List index for `token`; "-" (append) only when adding
+    if append and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise PatchError(f"Invalid list index in {path!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not append):
+        raise PatchError(f"List index out of range in {path!r}")
+    return index
+
+
+def _resolve(data, tokens, path):
+    # The container holding the last token
+    target = data
+    for token in tokens[:-1]:
+        if isinstance(target, dict) and token in target:
+            target = target[token]
+        elif isinstance(target, list):
+            target = target[_index(target, token, path)]
+        else:
+            raise PatchError(f"Path not found: {path!r}")
+    if not isinstance(target, (dict, list)):
+        raise PatchError(f"Path not found: {path!r}")
+    return target
+
+
+def apply_operation(data, operation):
+    if not isinstance(operation, dict) or operation.get("op") not in OPS:
+        raise PatchError(f"Each operation needs an op in {OPS}")
+    op = operation["op"]
+    path = operation.get("path")
+    tokens = parse_pointer(path)
+    if not tokens:
+        raise PatchError("Operations on the whole config are not allowed")
+    if op != "remove" and "value" not in operation:
+        raise PatchError(f"{op} at {path!r} needs a value")
+    parent = _resolve(data, tokens, path)
+    key = tokens[-1]
+
+    if isinstance(parent, list):
+        index = _index(parent, key, path, append=op == "add")
+        if op == "add":
+            parent.insert(index, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            del parent[index]
+        elif op == "replace":
+            parent[index] = copy.deepcopy(operation["value"])
+        elif parent[index] != operation["value"]:
+            raise PatchError(f"Test failed at {path!r}")
+        return
+
+    if op != "add" and key not in parent:
+        raise PatchError(f"Path not found: {path!r}")
+    if op == "add" or op == "replace":
+        parent[key] = copy.deepcopy(operation["value"])
+    elif op == "remove":
+        del parent[key]
+    elif parent[key] != operation["value"]:
+        raise PatchError(f"Test failed at {path!r}")
+
+
+def apply_patch(data, operations):
+    # Returns a patched copy of `data`; `data` itself is left untouched
+    if not isinstance(operations, list) or not operations:
+        raise PatchError("Expected a non-empty list of operations")
+    patched = copy.deepcopy(data)
+    for operation in operations:
+        apply_operation(patched, operation)
+    return patched
+
+
+# --- Schema ---
+# Each spec is a function (value, path) -> list of error strings.
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def number(low=None, high=None, integer=False):
+    def check(value, path):
+        if not _is_number(value) or (integer and not isinstance(value, int)):
+            return [f"{path}: expected {'an integer' if integer else 'a number'}"]
+        if (low is not None and value < low) or (high is not None and value > high):
+            return [f"{path}: must be between {low} and {high}"]
+        return []
+    return check
+
+
+def string(pattern=None):
+    def check(value, path):
+        if not isinstance(value, str):
+            return [f"{path}: expected a string"]
+        if pattern and not re.fullmatch(pattern, value):
+            return [f"{path}: {value!r} is not in the expected format"]
+        return []
+    return check
+
+
+def boolean(value, path):
+    return [] if isinstance(value, bool) else [f"{path}: expected true or false"]
+
+
+def anything(value, path):
+    return []
+
+
+def one_of(*choices):
+    def check(value, path):
+        return [] if value in choices else [f"{path}: expected one of {list(choices)}"]
+    return check
+
+
+def optional(spec):
+    def check(value, path):
+        return [] if value is None else spec(value, path)
+    return check
+
+
+def list_of(item):
+    def check(value, path):
+        if not isinstance(value, list):
+            return [f"{path}: expected a list"]
+        return [error for i, entry in enumerate(value) for error in item(entry, f"{path}/{i}")]
+    return check
+
+
+def obj(fields=None, values=None, required=(), strict=False):
+    # `fields` checks known keys, `values` every other key; with neither,
+    # unknown keys are allowed unless `strict`
+    fields = fields or {}
+
+    def check(value, path):
+        if not isinstance(value, dict):
+            return [f"{path}: expected an object"]
+        errors = [f"{path}/{key}: is required" for key in required if key not in value]
+        for key, entry in value.items():
+            if key in fields:
+                errors += fields[key](entry, f"{path}/{key}")
+            elif values is not None:
+                errors += values(entry, f"{path}/{key}")
+            elif strict:
+                errors.append(f"{path}/{key}: unknown setting")
+        return errors
+    return check
+
+
+def _range(value, path):
+    errors = obj({"min": number(), "max": number(), "target": number()}, required=("min", "max"), strict=True)(value, path)
+    if errors:
+        return errors
+    if value["min"] > value["max"]:
+        return [f"{path}: min is above max"]
+    if "target" in value and not value["min"] <= value["target"] <= value["max"]:
+        return [f"{path}: target is outside min..max"]
+    return []
+
+
+HHMM = r"([01]\d|2[0-3]):[0-5]\d"
+PH_FILTERS = ("median", "trimmed_mean", "mean")  # meters/ph.py FILTERS
+
+STAGE = obj({"Air Temperature": obj(values=_range)}, values=_range)
+
+FIELDS = {
+    "Sensor Pins": obj(values=number(0, 7, integer=True)),
+    "Climate Sensor": obj({"i2c_bus": optional(number(0, integer=True))}, strict=True),
+    "Kasa configs": obj({"Username": string(), "Password": string(), "Device_IPs": obj(values=string())}, strict=True),
+    "Ideal Ranges": obj(values=STAGE),
+    "State": obj({"Current Stage": string()}),
+    "Light Schedule": obj({"on": string(HHMM), "off": string(HHMM)}, required=("on", "off"), strict=True),
+    "Units": obj({
+        "Temperature": one_of("F", "C"),
+        "Humidity Metric": one_of("RH", "VPD"),
+        "Time": one_of("12h", "24h")
+    }, strict=True),
+    "PH Calibration": obj({
+        "type": one_of("linear", "quadratic"),
+        "slope": number(), "intercept": number(), "a": number(), "b": number(), "c": number()
+    }, strict=True),
+    "PH Calibration Points": list_of(obj({"ph": number(0, 14), "voltage": number()}, required=("ph", "voltage"), strict=True)),
+    "PH Sampling": obj({
+        "samples": number(1, 1000, integer=True),
+        "filter": one_of(*PH_FILTERS),
+        "trim": number(0, 0.5),
+        "outlier_sigma": number(0)
+    }, strict=True),
+    "Sampling Intervals": obj(values=number(1)),
+    "Climate Cache Seconds": number(0),
+    "Water Temperature Probes": obj(values=string()),
+    "Water Temperature Resolution": optional(one_of(9, 10, 11, 12)),
+    "Derived Metrics": obj({"leaf_temperature_offset": number(), "light_ppfd": optional(number(0))}, strict=True),
+}
+
+SCHEMA = obj({
+    **FIELDS,
+    "Email Settings": obj({
+        "smtp_server": string(), "smtp_port": number(1, 65535, integer=True),
+        "username": string(), "password": string(), "from_email": string(), "to_email": string(),
+        "starttls": boolean
+    }, strict=True),
+    "Notification Settings": obj({
+        "Polling Interval": number(0),
+        "Notification Thresholds": obj(values=number(0)),
+        "Notification Methods": list_of(string()),
+        "Alert Cooldown Minutes": number(0),
+        "Alert Digest Seconds": number(0)
+    }),
+    "Zones": obj(values=obj(FIELDS, strict=True)),
+    "Node Name": string(),
+    "Peers": obj(values=string(r"https?://\S+")),
+}, required=("Sensor Pins", "Kasa configs", "Ideal Ranges", "State"))
+
+
+def validate(data):
+    # Schema errors plus checks that span settings, as a list of strings
+    errors = SCHEMA(data, "")
+    if errors:
+        return errors
+    for name in zone_names(data):
+        merged = zone_config(data, name)
+        stage = merged["State"].get("Current Stage")
+        if stage not in merged["Ideal Ranges"]:
+            errors.append(f"zone {name}: stage {stage!r} has no Ideal Ranges")
+    return errors
@@ -0,0 +1,93 @@
+import atexit
+import copy
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+class ConfigStore:
+    # Keeps data.json parsed in memory. The file is re-read only when its
+    # mtime, inode or size changes (e.g. hand edits or install.sh), and
+    # writes are atomic and coalesced: several saves inside `write_delay`
+    # seconds become a single temp-file-plus-rename.
+
+    def __init__(self, path, write_delay=1.0):
+        self.path = path
+        self.write_delay = write_delay
+        self.version = 0
+        self._lock = threading.RLock()
+        self._data = None
+        self._file_key = None
+        self._dirty = False
+        self._timer = None
+        atexit.register(self.flush)  # Only on a normal exit; app.py turns SIGTERM into one
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def read(self):
+        # Returns the shared parsed config; callers must not mutate it
+        with self._lock:
+            if self._dirty:
+                return self._data
+            key = self._stat()
+            if key != self._file_key:
+                with open(self.path, "r") as f:
+                    self._data = json.load(f)
+                self._file_key = key
+                self.version += 1
+            return self._data
+
+    def load(self):
+        # Returns a private copy that is safe to modify and pass to save()
+        return copy.deepcopy(self.read())
+
+    def save(self, data):
+        with self._lock:
+            if data == self._data:
+                return self.version
+            self._data = copy.deepcopy(data)
+            self._dirty = True
+            self.version += 1
+            if self._timer is None:
+                self._timer = threading.Timer(self.write_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return self.version
+
+    @contextmanager
+    def edit(self):
+        # Read-modify-write under the store lock so concurrent edits can't
+        # overwrite each other. Nothing is saved if the block raises.
+        with self._lock:
+            data = self.load()
+            yield data
+            self.save(data)
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix=".data.json.", dir=directory)
+            try:
+                try:
+                    os.fchmod(fd, os.stat(self.path).st_mode & 0o777)
+                except FileNotFoundError:
+                    pass
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self._data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            self._file_key = self._stat()
+            self._dirty = False
@@ -0,0 +1,168 @@
+import derived
+from scheduler import parse_hhmm
+
+# Climate and light decisions, kept free of I/O so the live controller and
+# the replay engine (replay.py) run exactly the same logic.
+
+
+def to_celsius(f):
+    return derived.f_to_c(f)
+
+
+def calculate_vpd(temp_c, rh):
+    return round(derived.vpd(temp_c, rh), 3)
+
+
+def light_should_be_on(light_sched, now):
+    # `now` is a datetime.time
+    on_time = parse_hhmm(light_sched["on"])
+    off_time = parse_hhmm(light_sched["off"])
+
+    # Handle overnight schedules
+    if on_time < off_time:
+        return on_time <= now < off_time
+    return now >= on_time or now < off_time
+
+
+def sensor_range(data, name):
+    # (min, max) for a sampled sensor in its raw unit, or None
+    units = data.get("Units", {})
+    ideal = data["Ideal Ranges"].get(data["State"].get("Current Stage"), {})
+    if name == "temperature":
+        bounds = ideal.get("Air Temperature", {}).get("Lights On")
+        if bounds and units.get("Temperature", "F") == "C":
+            return (derived.c_to_f(bounds["min"]), derived.c_to_f(bounds["max"]))
+    elif name == "humidity":
+        if units.get("Humidity Metric", "RH") == "VPD":
+            return None
+        bounds = ideal.get("Relative Humidity")
+    elif name == "ph":
+        bounds = ideal.get("Water pH")
+    else:
+        bounds = None
+    return (bounds["min"], bounds["max"]) if bounds else None
+
+
+def decide(data, temp_val, rh_val, now):
+    # Returns (desired, actions): the on/off state wanted for every plug in
+    # Device_IPs and a description of each decision. `now` is a datetime
+    # (the virtual clock in replays). desired is None when the configuration
+    # can't be used.
+    stage = data["State"]["Current Stage"]
+    light_state = "Lights On"  # Or determine based on schedule
+    ideal = data["Ideal Ranges"][stage]
+    device_ips = data["Kasa configs"]["Device_IPs"]
+
+    units = data.get("Units", {})
+    humidity_metric = units.get("Humidity Metric", "RH")
+    temp_unit = units.get("Temperature", "F")
+
+    # --- FIX: Ensure temp_range is a flat dict ---
+    temp_range = ideal["Air Temperature"][light_state]
+    if not (isinstance(temp_range, dict) and "min" in temp_range and "max" in temp_range and "target" in temp_range):
+        return None, ["Error: Invalid temperature range configuration."]
+
+    if humidity_metric == "VPD" and isinstance(temp_val, (int, float)) and isinstance(rh_val, (int, float)):
+        temp_c = temp_val if temp_unit == "C" else to_celsius(temp_val)
+        humidity_val = calculate_vpd(temp_c, rh_val)
+        hum_range = ideal.get("VPD", {"min": 0.8, "max": 1.2, "target": 1.0})
+    else:
+        humidity_val = rh_val
+        hum_range = ideal.get("Relative Humidity", {"min": 40, "max": 60, "target": 50})
+
+    actions = []
+    fan_on = True  # Default: keep fan ON
+    humid_on = False
+    dehumid_on = False
+    heater_on = False
+
+    # --- Fan logic ---
+    if humidity_metric == "VPD":
+        # Fan ON if temp > min and VPD < max (humid, needs drying)
+        if isinstance(temp_val, (int, float)) and isinstance(humidity_val, (int, float)) and temp_val > temp_range["min"] and humidity_val < hum_range["max"]:
+            fan_on = True
+            actions.append("Fan ON (temp > min and VPD < max: air humid, drying)")
+        else:
+            fan_on = False
+            actions.append("Fan OFF (temp <= min or VPD >= max: air dry or temp low)")
+    else:
+        # Original logic for RH
+        if isinstance(temp_val, (int, float)) and temp_val < temp_range["min"]:
+            fan_on = False
+            actions.append("Fan OFF (temp too low)")
+        else:
+            fan_on = True
+            actions.append("Fan ON (temp at/above min)")
+
+    # Humidifier logic (fix for VPD)
+    if humidity_metric == "VPD":
+        # For VPD, high value = low RH (too dry), so turn ON humidifier if VPD > max
+        if humidity_val > hum_range["max"]:
+            humid_on = True
+            actions.append("Humidifier ON (VPD too high, air too dry)")
+        else:
+            humid_on = False
+            actions.append("Humidifier OFF (VPD ok or too low)")
+        # For dehumidifier, turn ON if VPD < min (too humid)
+        if "Dehumidifier" in device_ips:
+            if humidity_val < hum_range["min"]:
+                dehumid_on = True
+                actions.append("Dehumidifier ON (VPD too low, air too humid)")
+            else:
+                dehumid_on = False
+                actions.append("Dehumidifier OFF (VPD ok or too high)")
+    else:
+        # RH logic (original)
+        if humidity_val < hum_range["min"]:
+            humid_on = True
+            actions.append("Humidifier ON (RH too low)")
+        else:
+            humid_on = False
+            actions.append("Humidifier OFF (RH ok or too high)")
+        if "Dehumidifier" in device_ips:
+            if humidity_val > hum_range["max"]:
+                dehumid_on = True
+                actions.append("Dehumidifier ON (RH too high)")
+            else:
+                dehumid_on = False
+                actions.append("Dehumidifier OFF (RH ok or too low)")
+
+    # --- Dehumidifier logic ---
+    if "Dehumidifier" in device_ips:
+        if humidity_val > hum_range["max"]:
+            dehumid_on = True
+            actions.append("Dehumidifier ON (humidity too high)")
+        elif humidity_val <= hum_range["target"]:
+            dehumid_on = False
+            actions.append("Dehumidifier OFF (humidity at/below target)")
+        else:
+            actions.append("Dehumidifier state unchanged")
+
+    # --- Heater logic ---
+    # Turn ON if temp < min, OFF if >= target
+    if "Heater" in device_ips:
+        if temp_val < temp_range["min"]:
+            heater_on = True
+            actions.append("Heater ON (temp too low)")
+        elif temp_val >= temp_range["target"]:
+            heater_on = False
+            actions.append("Heater OFF (temp at/above target)")
+        else:
+            actions.append("Heater state unchanged")
+
+    # --- Light schedule logic ---
+    light_sched = data.get("Light Schedule", {"on": "06:00", "off": "22:00"})
+    light_on = light_should_be_on(light_sched, now.time())
+
+    desired = {}
+    if "Fan" in device_ips:
+        desired["Fan"] = fan_on
+    if "Humidifier" in device_ips:
+        desired["Humidifier"] = humid_on
+    if "Dehumidifier" in device_ips:
+        desired["Dehumidifier"] = dehumid_on
+    if "Heater" in device_ips:
+        desired["Heater"] = heater_on
+    if "Light" in device_ips:
+        desired["Light"] = light_on
+    return desired, actions
@@ -1,41 +1,159 @@
 import asyncio
-from kasa import Discover, SmartPlug
+import time
+
+def _discover():
+    # python-kasa takes a good half second to import on a Pi, so it is
+    # loaded on first use (or by preload() from the startup phases)
+    from kasa import Discover
+    return Discover
+
+def preload():
+    _discover()
+
+# --- Device connection pool ---
+# One handle per plug IP, connected on first use and reused by every later
+# command so each call costs a single round trip instead of a discovery and
+# auth handshake. Handles are bound to the event loop that created them, so
+# the pool starts over if it is used from a different loop.
+_pool = {}
+_pool_locks = {}
+_pool_loop = None
+
+def _check_loop():
+    global _pool_loop
+    loop = asyncio.get_running_loop()
+    if loop is not _pool_loop:
+        _pool.clear()
+        _pool_locks.clear()
+        _pool_loop = loop
+
+async def get_device(ip, usern, pas):
+    _check_loop()
+    creds = (str(usern), str(pas))
+    entry = _pool.get(ip)
+    if entry and entry[1] == creds:
+        return entry[0]
+    lock = _pool_locks.setdefault(ip, asyncio.Lock())
+    async with lock:
+        entry = _pool.get(ip)
+        if entry and entry[1] == creds:
+            return entry[0]
+        if entry:
+            await _close(entry[0])
+        dev = await _discover().discover_single(str(ip), username=creds[0], password=creds[1])
+        if dev is None:
+            raise ConnectionError(f"No Kasa device answered at {ip}")
+        _pool[ip] = (dev, creds)
+        return dev
+
+async def drop_device(ip):
+    entry = _pool.pop(ip, None)
+    if entry:
+        await _close(entry[0])
+
+async def close_all():
+    for ip in list(_pool):
+        await drop_device(ip)
+
+async def _close(dev):
+    try:
+        await dev.disconnect()
+    except Exception:
+        pass
+
+async def _with_device(ip, usern, pas, action):
+    # Run `action(dev)` on the pooled handle; if the connection has gone
+    # stale, reconnect once and retry.
+    try:
+        return await action(await get_device(ip, usern, pas))
+    except Exception:
+        await drop_device(ip)
+        return await action(await get_device(ip, usern, pas))
+
+# --- Discovery ---
 
 async def findDeviceIps(usern, pas):
-    dev = await Discover.discover(username=str(usern), password=str(pas))
+    dev = await _discover().discover(username=str(usern), password=str(pas))
     return [device.host for device in dev.values()]
 
+async def discover_aliases(usern, pas):
+    # One discovery broadcast, then every device's alias is resolved in
+    # parallel. Returns {alias: {"ip": ..., "mac": ...}}. A plug that is
+    # already pooled keeps its handle and the discovered one is closed;
+    # otherwise the discovered handle joins the pool for later commands.
+    _check_loop()
+    creds = (str(usern), str(pas))
+    found = await _discover().discover(username=creds[0], password=creds[1])
+
+    async def describe(dev):
+        async with _pool_locks.setdefault(dev.host, asyncio.Lock()):
+            entry = _pool.get(dev.host)
+            if entry and entry[1] == creds:
+                try:
+                    await entry[0].update()
+                except Exception:
+                    pass  # Stale; replaced by the discovered handle below
+                else:
+                    await _close(dev)
+                    return entry[0].alias, {"ip": dev.host, "mac": entry[0].mac}
+            await dev.update()
+            _pool[dev.host] = (dev, creds)
+            if entry:
+                await _close(entry[0])
+        return dev.alias, {"ip": dev.host, "mac": dev.mac}
+
+    results = await asyncio.gather(*(describe(dev) for dev in found.values()), return_exceptions=True)
+    return dict(result for result in results if not isinstance(result, Exception))
+
 async def get_Device_IP(usern, pas, name):
-    ips = await findDeviceIps(usern, pas)
-    for ip in ips:
-        device = await Discover.discover_single(str(ip), username=str(usern), password=str(pas))
-        await device.update()
-        if device.alias == name:
-            return ip
-    return None
-    
+    info = (await discover_aliases(usern, pas)).get(name)
+    return info["ip"] if info else None
+
+class AliasDirectory:
+    # Cached alias -> IP/MAC map from discover_aliases(). Concurrent refreshes
+    # share one scan; callers decide when the cache is stale enough to refresh.
+
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self.aliases = {}
+        self.timestamp = 0
+        self._scan = None
+
+    def is_stale(self, now):
+        return now - self.timestamp > self.ttl
+
+    async def refresh(self, usern, pas):
+        if self._scan is None or self._scan.done():
+            self._scan = asyncio.ensure_future(self._run_scan(usern, pas))
+        return await asyncio.shield(self._scan)
+
+    async def _run_scan(self, usern, pas):
+        self.aliases = await discover_aliases(usern, pas)
+        self.timestamp = time.time()
+        return self.aliases
+
+# --- Commands ---
+
 async def turnOn(ip,usern,pas):
-    dev = await Discover.discover_single(str(ip),username=str(usern),password=str(pas))
-    await dev.turn_on()
-    await dev.update()
+    await _with_device(ip, usern, pas, lambda dev: dev.turn_on())
 
 async def turnOff(ip,usern,pas):
-    dev = await Discover.discover_single(str(ip),username=str(usern),password=str(pas))
-    await dev.turn_off()
-    await dev.update()
+    await _with_device(ip, usern, pas, lambda dev: dev.turn_off())
 
 async def turnToggle(ip,usern,pas):
-    dev= await Discover.discover_single(str(ip),username=str(usern),password=str(pas))
-    if dev.is_on():
-        await dev.turn_off()
-    else:
-        await dev.turn_on()
-    await dev.update()
-
-def get_plug_status(ip):
+    async def toggle(dev):
+        await dev.update()
+        if dev.is_on:
+            await dev.turn_off()
+        else:
+            await dev.turn_on()
+    await _with_device(ip, usern, pas, toggle)
+
+async def async_get_plug_status(ip, usern, pas):
+    async def status(dev):
+        await dev.update()
+        return dev.is_on
     try:
-        plug = SmartPlug(ip)
-        asyncio.run(plug.update())
-        return plug.is_on
-    except Exception as e:
-        return False  # or None if you want to show "unknown"
\ No newline at end of file
+        return await _with_device(ip, usern, pas, status)
+    except Exception:
+        return None
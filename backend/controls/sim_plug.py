@@ -0,0 +1,91 @@
+import asyncio
+
+from meters.sim import FAULTS
+
+# Local stand-in for python-kasa, used when GROWPI_SIM=1. install() points
+# controls/plug.py at this module's Discover instead of kasa's, so the
+# connection pool, stale-handle retries and the Kasa event loop all run
+# exactly as they do against real plugs. Plugs live at made-up addresses
+# and remember their state; every request pays the simulated network
+# latency and may fail (see meters/sim.py), and connecting to a plug costs
+# a discovery and auth handshake on top.
+
+PLUG_ALIASES = ["Fan", "Humidifier", "Light", "Dehumidifier", "Heater"]
+HANDSHAKE_ROUND_TRIPS = 3  # Discovery reply, then the KLAP auth exchange
+
+_plugs = {
+    f"10.0.0.{10 + index}": {"alias": alias, "mac": f"50:C7:BF:00:00:{10 + index:02X}", "is_on": False}
+    for index, alias in enumerate(PLUG_ALIASES)
+}
+switch_count = 0
+connect_count = 0
+
+
+def device_ips():
+    return {state["alias"]: ip for ip, state in _plugs.items()}
+
+
+def install():
+    from controls import plug
+    plug._discover = lambda: Discover
+
+
+async def _round_trip(ip, what, count=1):
+    fault = FAULTS["plug"]
+    for _ in range(count):
+        await asyncio.sleep(fault.delay())
+    if ip not in _plugs:
+        raise ConnectionError(f"No simulated plug at {ip}")
+    fault.check(f"plug {what}")
+    return _plugs[ip]
+
+
+class Device:
+    # The parts of kasa.Device that controls/plug.py uses
+    def __init__(self, host):
+        self.host = host
+        self.alias = None
+        self.mac = None
+        self.is_on = None
+        self._connected = True
+
+    async def _request(self, what):
+        if not self._connected:
+            raise ConnectionError(f"Simulated plug {self.host} is disconnected")
+        return await _round_trip(self.host, what)
+
+    async def update(self):
+        state = await self._request("status")
+        self.alias, self.mac, self.is_on = state["alias"], state["mac"], state["is_on"]
+
+    async def turn_on(self):
+        await self._switch(True)
+
+    async def turn_off(self):
+        await self._switch(False)
+
+    async def _switch(self, on):
+        global switch_count
+        state = await self._request("on" if on else "off")
+        if state["is_on"] != on:
+            switch_count += 1
+        state["is_on"] = self.is_on = on
+
+    async def disconnect(self):
+        self._connected = False
+
+
+class Discover:
+    @staticmethod
+    async def discover_single(host, username=None, password=None):
+        global connect_count
+        await _round_trip(host, "connect", HANDSHAKE_ROUND_TRIPS)
+        connect_count += 1
+        return Device(host)
+
+    @staticmethod
+    async def discover(username=None, password=None):
+        global connect_count
+        await asyncio.sleep(FAULTS["plug"].delay())  # One broadcast; every plug answers
+        connect_count += len(_plugs)
+        return {ip: Device(ip) for ip in _plugs}
@@ -0,0 +1,209 @@
+import math
+
+# Derived climate metrics. Every function takes floats or NumPy arrays and
+# returns the same back, so the controller's single readings, /api/status
+# and history queries over thousands of samples share one implementation.
+# Floats take the math module path: NumPy's per-call overhead is ~20x the
+# arithmetic for a single value. NumPy itself is imported by the array paths
+# only, so loading this module (the controller does) doesn't load it.
+#
+# Instantaneous metrics are listed in METRICS (see register()); /api/status,
+# /api/history and the derived-range alerts pick them up from there.
+
+MOLAR_MASS_WATER = 18.015  # g/mol
+GAS_CONSTANT = 8.314  # J/(mol K)
+
+
+def _scalar(value):
+    return isinstance(value, (int, float))
+
+
+def _exp(value):
+    if _scalar(value):
+        return math.exp(value)
+    import numpy as np
+    return np.exp(value)
+
+
+def _log(value):
+    if _scalar(value):
+        return math.log(value)
+    import numpy as np
+    return np.log(value)
+
+
+def _at_least(value, low):
+    if _scalar(value):
+        return max(value, low)
+    import numpy as np
+    return np.maximum(value, low)
+
+
+def f_to_c(f):
+    return (f - 32) * 5.0 / 9.0
+
+
+def c_to_f(c):
+    return c * 9.0 / 5.0 + 32
+
+
+def svp(temp_c):
+    # Saturation vapour pressure in kPa (Tetens)
+    return 0.61078 * _exp(17.27 * temp_c / (temp_c + 237.3))
+
+
+def vpd(temp_c, rh):
+    # Air vapour pressure deficit in kPa
+    return svp(temp_c) * (1 - rh / 100.0)
+
+
+def leaf_vpd(temp_c, rh, leaf_offset_c=-2.0):
+    # VPD between the leaf (usually a little cooler than the air) and the air
+    return svp(temp_c + leaf_offset_c) - svp(temp_c) * rh / 100.0
+
+
+def dew_point(temp_c, rh):
+    # Dew point in °C (Magnus formula); RH is floored at 0.01 % to keep the log finite
+    gamma = _log(_at_least(rh, 0.01) / 100.0) + 17.27 * temp_c / (237.3 + temp_c)
+    return 237.3 * gamma / (17.27 - gamma)
+
+
+def absolute_humidity(temp_c, rh):
+    # Water vapour per volume of air in g/m³
+    vapour_pa = svp(temp_c) * rh / 100.0 * 1000
+    return vapour_pa * MOLAR_MASS_WATER / (GAS_CONSTANT * (temp_c + 273.15))
+
+
+def dli(ppfd, light_seconds):
+    # Daily light integral in mol/m²/day from PPFD (µmol/m²/s) and seconds of light
+    return ppfd * light_seconds / 1e6
+
+
+# --- Series helpers ---
+
+def align(target_ts, ts, values):
+    # The latest value of (ts, values) at or before each target time; NaN
+    # before the first sample
+    import numpy as np
+    ts = np.asarray(ts, dtype=float)
+    values = np.asarray(values, dtype=float)
+    index = np.searchsorted(ts, target_ts, side="right") - 1
+    if not len(values):
+        return np.full(len(target_ts), np.nan)
+    return np.where(index >= 0, values[np.clip(index, 0, None)], np.nan)
+
+
+def bucket(ts, values, start, step):
+    # min/mean/max per `step` seconds, in the shape HistoryStore.query() returns
+    import numpy as np
+    ts = np.asarray(ts, dtype=float)
+    values = np.asarray(values, dtype=float)
+    keep = np.isfinite(values)
+    ts, values = ts[keep], values[keep]
+    if not len(values):
+        return []
+    buckets, inverse, counts = np.unique(((ts - start) // step).astype(np.int64), return_inverse=True, return_counts=True)
+    means = np.bincount(inverse, weights=values) / counts
+    lows = np.full(len(buckets), np.inf)
+    highs = np.full(len(buckets), -np.inf)
+    np.minimum.at(lows, inverse, values)
+    np.maximum.at(highs, inverse, values)
+    return [
+        {"t": start + int(b) * step, "min": lo, "mean": mean, "max": hi, "count": int(count)}
+        for b, lo, mean, hi, count in zip(buckets, lows.tolist(), means.tolist(), highs.tolist(), counts)
+    ]
+
+
+def on_seconds(ts, states, edges):
+    # Seconds a recorded on/off state (1/0 at each change or check) was on
+    # between consecutive `edges`. The state holds until the next sample;
+    # before the first sample it counts as off.
+    import numpy as np
+    ts = np.asarray(ts, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    if not len(ts):
+        return np.zeros(len(edges) - 1)
+    states = np.asarray(states, dtype=float)
+    # Cumulative on-time is piecewise linear with knots at the samples
+    knots = np.append(ts, max(ts[-1], edges[-1]))
+    cumulative = np.concatenate(([0.0], np.cumsum(states * np.diff(knots))))
+    return np.diff(np.interp(edges, knots, cumulative, left=0.0))
+
+
+# --- Registry ---
+
+class Metric:
+    def __init__(self, name, label, inputs, unit, func, range_key=None):
+        self.name = name
+        self.label = label
+        self.inputs = inputs  # Sampled sensors, in their raw units (°F, %RH)
+        self.unit = unit  # "temperature" means the configured temperature unit
+        self.func = func  # func(settings, *inputs)
+        self.range_key = range_key  # Ideal Ranges entry used for alerts
+
+    def compute(self, settings, *inputs):
+        return self.func(settings, *inputs)
+
+    def unit_for(self, settings):
+        return "°" + settings["temperature_unit"] if self.unit == "temperature" else self.unit
+
+
+METRICS = {}
+
+
+def register(name, label, inputs, unit, range_key=None):
+    def wrap(func):
+        METRICS[name] = Metric(name, label, inputs, unit, func, range_key)
+        return func
+    return wrap
+
+
+def settings(data):
+    # What the metrics need from a zone's config
+    temp_unit = data.get("Units", {}).get("Temperature", "F")
+    options = data.get("Derived Metrics", {})
+    leaf_offset = options.get("leaf_temperature_offset", -2.0 if temp_unit == "C" else -3.6)
+    return {
+        "temperature_unit": temp_unit,
+        # Offsets are temperature differences: scale, don't shift
+        "leaf_offset_c": leaf_offset if temp_unit == "C" else leaf_offset * 5.0 / 9.0,
+        "light_ppfd": options.get("light_ppfd")
+    }
+
+
+def _display_temperature(temp_c, settings):
+    return temp_c if settings["temperature_unit"] == "C" else c_to_f(temp_c)
+
+
+@register("vpd", "Vapour pressure deficit", ("temperature", "humidity"), "kPa", "VPD")
+def _vpd(settings, temp_f, rh):
+    return vpd(f_to_c(temp_f), rh)
+
+
+@register("leaf_vpd", "Leaf vapour pressure deficit", ("temperature", "humidity"), "kPa", "Leaf VPD")
+def _leaf_vpd(settings, temp_f, rh):
+    return leaf_vpd(f_to_c(temp_f), rh, settings["leaf_offset_c"])
+
+
+@register("dew_point", "Dew point", ("temperature", "humidity"), "temperature", "Dew Point")
+def _dew_point(settings, temp_f, rh):
+    return _display_temperature(dew_point(f_to_c(temp_f), rh), settings)
+
+
+@register("absolute_humidity", "Absolute humidity", ("temperature", "humidity"), "g/m³", "Absolute Humidity")
+def _absolute_humidity(settings, temp_f, rh):
+    return absolute_humidity(f_to_c(temp_f), rh)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def compute(values, settings, digits=3):
+    # Every registered metric whose inputs are numbers in `values`
+    result = {}
+    for name, metric in METRICS.items():
+        inputs = [values.get(key) for key in metric.inputs]
+        if all(_is_number(value) for value in inputs):
+            result[name] = round(metric.compute(settings, *inputs), digits)
+    return result
@@ -0,0 +1,39 @@
+import asyncio
+import concurrent.futures
+import threading
+
+
+class EventLoopThread:
+    # One asyncio loop running forever on a daemon thread. Synchronous code
+    # (Flask routes, background threads) hands it coroutines with run() or
+    # submit(), so every Kasa connection lives on the same loop and can be
+    # reused between calls.
+
+    def __init__(self, name="kasa-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        # Schedule `coro` on the loop and return a concurrent.futures.Future
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        # Block the calling thread until `coro` finishes on the loop. On
+        # timeout the coroutine is cancelled and TimeoutError is raised.
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("EventLoopThread.run() called from the loop thread; await the coroutine instead")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Coroutine did not finish within {timeout}s")
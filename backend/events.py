@@ -0,0 +1,55 @@
+import json
+import queue
+import threading
+
+
+class Broadcaster:
+    # Fans one producer's state out to any number of subscribers. The
+    # producer publishes the full state; subscribers receive only the keys
+    # that changed since the previous publish.
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._state = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, state):
+        with self._lock:
+            delta = {key: value for key, value in state.items() if self._state.get(key, object()) != value}
+            if not delta:
+                return None
+            self._state.update(delta)
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(delta)
+            except queue.Full:
+                # A stalled client gets the full state once it catches up
+                # instead of an ever-growing backlog.
+                with q.mutex:
+                    q.queue.clear()
+                q.put_nowait(self.state())
+        return delta
+
+    def state(self):
+        with self._lock:
+            return dict(self._state)
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add(q)
+            return q, dict(self._state)
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,186 @@
+import csv
+import datetime
+import importlib.util
+import io
+
+import numpy as np
+
+import derived
+
+# pyarrow is optional (CSV export is always available) and is only imported
+# by the Parquet/Arrow encoders, so a CSV export never pays for loading it.
+
+# Streaming history export for /api/export. Rows are read from SQLite one
+# time window at a time and encoded as they go, so memory stays flat no
+# matter how long the range is. Every format has the same long layout:
+#
+#   timestamp,time,metric,value
+#   1760000000.0,2025-10-09T08:53:20+00:00,temperature,74.3
+#
+# Sensor readings are exported as recorded, derived metrics are computed
+# from them, and plug states only where they change.
+
+WINDOW_SECONDS = 60 * 60
+ROW_GROUP_ROWS = 50000  # Parquet/Arrow rows buffered per row group/batch
+COLUMNS = ("timestamp", "time", "metric", "value")
+MIMETYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+
+def formats():
+    return ["csv", "parquet", "arrow"] if importlib.util.find_spec("pyarrow") else ["csv"]
+
+
+def rows(history, key, sensors, derived_metrics, plugs, settings, start, end):
+    # Yields lists of (timestamp, metric, value), oldest first, one list per
+    # window. `key(name)` is the stored metric name (zone prefix).
+    inputs = sorted({name for metric in derived_metrics for name in derived.METRICS[metric].inputs})
+    names = sorted(set(sensors) | set(inputs) | set(plugs))
+    by_key = {key(name): name for name in names}
+    last = {}  # name -> (ts, value) carried across windows
+    history.flush()
+    for window_start in np.arange(start, end, WINDOW_SECONDS).tolist():
+        window_end = min(window_start + WINDOW_SECONDS, end)
+        series = {name: [] for name in names}
+        for metric, ts, value in history.rows(list(by_key), window_start, window_end):
+            series[by_key[metric]].append((ts, value))
+        out = [(ts, name, value) for name in sensors for ts, value in series[name]]
+        out += _derived_rows(derived_metrics, series, last, settings)
+        for name in plugs:
+            for ts, value in series[name]:
+                if last.get(name, (None, None))[1] != value:
+                    out.append((ts, name, value))
+                    last[name] = (ts, value)
+        for name in inputs:
+            if series[name]:
+                last[name] = series[name][-1]
+        if out:
+            out.sort(key=lambda row: row[0])
+            yield out
+
+
+def _derived_rows(derived_metrics, series, last, settings):
+    # Evaluated at the first input's samples, with the other inputs as of
+    # then (including the last value seen in earlier windows)
+    out = []
+    for name in derived_metrics:
+        metric = derived.METRICS[name]
+        first = series[metric.inputs[0]]
+        if not first:
+            continue
+        ts, values = np.array(first).T
+        columns = [values]
+        for other in metric.inputs[1:]:
+            samples = ([last[other]] if other in last else []) + series[other]
+            if not samples:
+                break
+            columns.append(derived.align(ts, *np.array(samples).T))
+        else:
+            result = metric.compute(settings, *columns)
+            out += [(t, name, value) for t, value in zip(ts.tolist(), result.tolist()) if np.isfinite(value)]
+    return out
+
+
+def _iso(ts):
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat()
+
+
+def encode_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in chunks:
+        writer.writerows((ts, _iso(ts), metric, value) for ts, metric, value in chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Sink(io.RawIOBase):
+    # Write-only file that hands its bytes out as they are written, for
+    # pyarrow writers feeding a streamed response
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("timestamp", pa.float64()),
+        ("time", pa.timestamp("ms", tz="UTC")),
+        ("metric", pa.dictionary(pa.int16(), pa.string())),
+        ("value", pa.float64())
+    ])
+
+
+def _batches(chunks, schema):
+    # Record batches of about ROW_GROUP_ROWS rows
+    pending = []
+    for chunk in chunks:
+        pending += chunk
+        if len(pending) < ROW_GROUP_ROWS:
+            continue
+        yield _batch(pending, schema)
+        pending = []
+    if pending:
+        yield _batch(pending, schema)
+
+
+def _batch(rows, schema):
+    import pyarrow as pa
+    ts, metric, value = zip(*rows)
+    return pa.record_batch([
+        pa.array(ts, pa.float64()),
+        pa.array([round(t * 1000) for t in ts], pa.int64()).cast(pa.timestamp("ms", tz="UTC")),
+        pa.array(metric, pa.string()).dictionary_encode().cast(schema.field("metric").type),
+        pa.array(value, pa.float64())
+    ], schema=schema)
+
+
+def encode_parquet(chunks):
+    import pyarrow.parquet as pq
+    schema = _schema()
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    for batch in _batches(chunks, schema):
+        writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def encode_arrow(chunks):
+    import pyarrow as pa
+    schema = _schema()
+    sink = _Sink()
+    writer = pa.ipc.new_stream(sink, schema)
+    yield sink.take()
+    for batch in _batches(chunks, schema):
+        writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+ENCODERS = {"csv": encode_csv, "parquet": encode_parquet, "arrow": encode_arrow}
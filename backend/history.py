@@ -0,0 +1,134 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Aim for roughly this many buckets when the caller doesn't pick a step
+DEFAULT_POINTS = 300
+MAX_POINTS = 5000
+
+
+class HistoryStore:
+    # Time-series store for sensor readings and plug states. Recent samples
+    # live in a fixed-size ring buffer; everything is appended to SQLite in
+    # batches by a background flush thread.
+
+    def __init__(self, path, buffer_size=4096, flush_interval=60):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._buffer = deque(maxlen=buffer_size)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS samples (metric TEXT NOT NULL, ts REAL NOT NULL, value REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS samples_metric_ts ON samples (metric, ts)")
+        self._db.commit()
+        self._thread = None
+
+    def record(self, metric, value, timestamp=None):
+        # Non-numeric values (sensor error dicts, unknown plug states) are skipped
+        if isinstance(value, bool):
+            value = 1.0 if value else 0.0
+        if not isinstance(value, (int, float)):
+            return
+        sample = (metric, time.time() if timestamp is None else timestamp, float(value))
+        with self._lock:
+            self._buffer.append(sample)
+            self._pending.append(sample)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        with self._db_lock:
+            self._db.executemany("INSERT INTO samples (metric, ts, value) VALUES (?, ?, ?)", pending)
+            self._db.commit()
+        return len(pending)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_loop, name="history-flush", daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"History flush error: {e}")
+
+    @staticmethod
+    def resolve_step(start, end, step=None):
+        # Bucket width for a query: the caller's, kept to at most MAX_POINTS buckets
+        if step is None or step <= 0:
+            step = (end - start) / DEFAULT_POINTS
+        return max(step, (end - start) / MAX_POINTS, 1.0)
+
+    def query(self, metric, start, end, step=None):
+        # Returns min/mean/max buckets of `step` seconds covering [start, end)
+        step = self.resolve_step(start, end, step)
+
+        with self._lock:
+            oldest = self._buffer[0][1] if self._buffer else None
+            recent = [s for s in self._buffer if s[0] == metric and start <= s[1] < end]
+        if oldest is not None and start >= oldest:
+            return self._bucket(recent, start, step)
+
+        self.flush()
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT CAST((ts - ?) / ? AS INTEGER) AS bucket, MIN(value), AVG(value), MAX(value), COUNT(*) "
+                "FROM samples WHERE metric = ? AND ts >= ? AND ts < ? GROUP BY bucket ORDER BY bucket",
+                (start, step, metric, start, end),
+            ).fetchall()
+        return [
+            {"t": start + bucket * step, "min": lo, "mean": mean, "max": hi, "count": count}
+            for bucket, lo, mean, hi, count in rows
+        ]
+
+    def samples(self, metric, start, end):
+        # Raw (ts, value) rows in [start, end), oldest first, for callers
+        # that compute over the samples themselves (derived metrics)
+        with self._lock:
+            oldest = self._buffer[0][1] if self._buffer else None
+            recent = [(ts, value) for m, ts, value in self._buffer if m == metric and start <= ts < end]
+        if oldest is not None and start >= oldest:
+            return recent
+
+        self.flush()
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT ts, value FROM samples WHERE metric = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (metric, start, end),
+            ).fetchall()
+
+    def rows(self, metrics, start, end):
+        # Raw (metric, ts, value) rows of several metrics in [start, end),
+        # oldest first. Reads SQLite only: flush() first for the newest samples.
+        placeholders = ", ".join("?" * len(metrics))
+        with self._db_lock:
+            return self._db.execute(
+                f"SELECT metric, ts, value FROM samples WHERE metric IN ({placeholders}) AND ts >= ? AND ts < ? ORDER BY ts",
+                (*metrics, start, end),
+            ).fetchall()
+
+    @staticmethod
+    def _bucket(samples, start, step):
+        buckets = {}
+        for _, ts, value in samples:
+            b = buckets.setdefault(int((ts - start) // step), [value, 0.0, value, 0])
+            b[0] = min(b[0], value)
+            b[1] += value
+            b[2] = max(b[2], value)
+            b[3] += 1
+        return [
+            {"t": start + bucket * step, "min": lo, "mean": total / count, "max": hi, "count": count}
+            for bucket, (lo, total, hi, count) in sorted(buckets.items())
+        ]
@@ -0,0 +1,45 @@
+import board
+from adafruit_htu21d import HTU21D
+import threading
+import time
+
+class ClimateSensor:
+    # The HTU21D measures temperature and humidity on the same chip. One
+    # instance owns the I2C bus object; a call to read() takes both values
+    # back to back and serves them to every caller for `cache_seconds`, so
+    # temperature and RH (and the VPD computed from them) always come from
+    # the same measurement.
+    def __init__(self, cache_seconds=2.0, bus=None):
+        if bus is None:
+            i2c = board.I2C()  # uses board.SCL and board.SDA
+        else:
+            # Extra HTU21Ds (one per zone) sit on their own I2C buses
+            from adafruit_extended_bus import ExtendedI2C
+            i2c = ExtendedI2C(bus)
+        self.sensor = HTU21D(i2c)
+        self.cache_seconds = cache_seconds
+        self._lock = threading.Lock()
+        self._reading = None
+
+    def read(self):
+        # Returns (celsius, relative_humidity)
+        with self._lock:
+            now = time.monotonic()
+            if self._reading is None or now - self._reading[2] >= self.cache_seconds:
+                celsius = self.sensor.temperature
+                rh_value = self.sensor.relative_humidity
+                self._reading = (celsius, rh_value, now)
+            return self._reading[0], self._reading[1]
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+def shared_sensor(cache_seconds=None, bus=None):
+    # The process-wide ClimateSensor for an I2C bus, created on first use
+    with _shared_lock:
+        sensor = _shared.get(bus)
+        if sensor is None:
+            sensor = _shared[bus] = ClimateSensor(bus=bus) if cache_seconds is None else ClimateSensor(cache_seconds, bus)
+        elif cache_seconds is not None:
+            sensor.cache_seconds = cache_seconds
+        return sensor
@@ -1,8 +1,18 @@
+import numpy as np
 from gpiozero import MCP3008
 
+VREF = 3.3
+ADC_MAX = 1023
+FILTERS = ("median", "trimmed_mean", "mean")
+
 class PHMeter:
-    def __init__(self, pin, slope=-5.6548, intercept=15.509, cal_type="linear", a=0, b=0, c=0):
+    def __init__(self, pin, slope=-5.6548, intercept=15.509, cal_type="linear", a=0, b=0, c=0, sampling=None):
         self.sensor = MCP3008(channel=pin)
+        self.set_calibration(slope, intercept, cal_type, a, b, c)
+        self.configure_sampling(**(sampling or {}))
+
+    def set_calibration(self, slope=-5.6548, intercept=15.509, cal_type="linear", a=0, b=0, c=0):
+        # Linear: ph = slope * V + intercept; quadratic: ph = a*V^2 + b*V + c
         self.slope = slope
         self.intercept = intercept
         self.cal_type = cal_type
@@ -10,12 +20,72 @@ class PHMeter:
         self.b = b
         self.c = c
 
+    def configure_sampling(self, samples=1, filter="median", trim=0.1, outlier_sigma=3.0):
+        # samples: ADC conversions per reading
+        # filter: how the surviving samples are combined, one of FILTERS
+        # trim: fraction cut from each end for "trimmed_mean"
+        # outlier_sigma: samples further than this many robust standard
+        #   deviations from the median are discarded (0 disables)
+        if filter not in FILTERS:
+            raise ValueError(f"Unknown pH filter {filter!r}, expected one of {FILTERS}")
+        self.samples = max(1, int(samples))
+        self.filter = filter
+        self.trim = min(max(float(trim), 0.0), 0.49)
+        self.outlier_sigma = float(outlier_sigma)
+        self.last_noise = None
+
     def read_voltage(self):
-        return self.sensor.value * 3.3
+        return self.sensor.value * VREF
 
-    def read_ph(self):
-        voltage = self.read_voltage()
+    def read_voltages(self, n):
+        # Burst of raw conversions straight into an array; scaling happens
+        # once over the whole batch.
+        raw = np.fromiter((self.sensor.raw_value for _ in range(n)), dtype=np.float64, count=n)
+        return raw * (VREF / ADC_MAX)
+
+    def filter_voltages(self, volts):
+        # Returns (voltage, noise) where noise is the standard deviation of
+        # the samples that survived outlier rejection.
+        median = np.median(volts)
+        if self.outlier_sigma > 0:
+            mad = np.median(np.abs(volts - median)) * 1.4826
+            if mad > 0:
+                volts = volts[np.abs(volts - median) <= self.outlier_sigma * mad]
+        if self.filter == "median":
+            voltage = np.median(volts)
+        elif self.filter == "trimmed_mean":
+            cut = int(len(volts) * self.trim)
+            ordered = np.sort(volts)
+            voltage = ordered[cut:len(ordered) - cut].mean()
+        else:
+            voltage = volts.mean()
+        return float(voltage), float(volts.std())
+
+    def read_filtered_voltage(self):
+        # One voltage through the configured sampling, e.g. for calibration points
+        return self.filter_voltages(self.read_voltages(self.samples))[0]
+
+    def voltage_to_ph(self, voltage):
         if self.cal_type == "quadratic":
             return self.a * voltage ** 2 + self.b * voltage + self.c
         else:
             return self.slope * voltage + self.intercept
+
+    def ph_per_volt(self, voltage):
+        # Sensitivity of the calibration curve, used to express noise in pH
+        if self.cal_type == "quadratic":
+            return abs(2 * self.a * voltage + self.b)
+        return abs(self.slope)
+
+    def read_ph_sample(self):
+        # Returns (ph, noise), with noise in pH units (None for single reads)
+        if self.samples == 1:
+            voltage, noise = self.read_voltage(), None
+        else:
+            voltage, volt_noise = self.filter_voltages(self.read_voltages(self.samples))
+            noise = round(volt_noise * self.ph_per_volt(voltage), 4)
+        self.last_noise = noise
+        return self.voltage_to_ph(voltage), noise
+
+    def read_ph(self):
+        return self.read_ph_sample()[0]
@@ -1,13 +1,10 @@
-import board
-from adafruit_htu21d import HTU21D
-import time
+from meters.climate import shared_sensor
+
 class RHMeter:
-    def __init__(self):
-        # Create sensor object, communicating over the board's default I2C bus
-        i2c = board.I2C()  # uses board.SCL and board.SDA
-        # i2c = board.STEMMA_I2C()  # For using the built-in STEMMA QT connector on a microcontroller
-        self.sensor = HTU21D(i2c)
+    def __init__(self, cache_seconds=None, bus=None):
+        # Shares one HTU21D (and its I2C bus object) with TemperatureSensor
+        self.climate = shared_sensor(cache_seconds, bus)
 
     def read_rh(self):
-        rh_value = self.sensor.relative_humidity
+        _, rh_value = self.climate.read()
         return rh_value
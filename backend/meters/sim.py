@@ -0,0 +1,195 @@
+import math
+import os
+import random
+import threading
+import time
+
+# Simulated stand-ins for the sensor drivers, used when GROWPI_SIM=1 so the
+# backend runs (and can be benchmarked) without a Pi. Each class has the same
+# constructor and read methods as the real driver it replaces.
+#
+# Every driver call goes through a FaultInjector, which adds bus latency and
+# fails a fraction of reads. Defaults approximate the real parts; override
+# them with configure() or the GROWPI_SIM_LATENCY_SCALE and
+# GROWPI_SIM_FAILURE_RATE environment variables.
+
+LATENCY_SCALE = float(os.environ.get("GROWPI_SIM_LATENCY_SCALE", 1.0))
+FAILURE_RATE = float(os.environ.get("GROWPI_SIM_FAILURE_RATE", 0.0))
+
+
+class FaultInjector:
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None, scale=LATENCY_SCALE):
+        self.latency = latency
+        self.jitter = jitter
+        self.scale = scale
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def delay(self):
+        return max(0.0, (self.latency + self.random.uniform(0, self.jitter)) * self.scale)
+
+    def check(self, what):
+        with self._lock:
+            self.calls += 1
+            failed = self.random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        if failed:
+            raise OSError(f"Simulated {what} failure")
+
+    def call(self, what):
+        # Blocking I/O: sleep for the simulated latency, then maybe fail
+        time.sleep(self.delay())
+        self.check(what)
+
+
+# One injector per driver kind, shared by every instance of that driver
+FAULTS = {
+    "climate": FaultInjector(latency=0.05, jitter=0.01, failure_rate=FAILURE_RATE),
+    "water_temperature": FaultInjector(latency=0.0, failure_rate=FAILURE_RATE),
+    "ph": FaultInjector(latency=0.0002, failure_rate=FAILURE_RATE),
+    "plug": FaultInjector(latency=0.05, jitter=0.05, failure_rate=FAILURE_RATE)
+}
+
+
+def configure(kind, **settings):
+    # e.g. configure("plug", latency=0.2, failure_rate=0.1)
+    fault = FAULTS[kind]
+    for key, value in settings.items():
+        if key == "seed":
+            fault.random.seed(value)
+        elif hasattr(fault, key):
+            setattr(fault, key, value)
+        else:
+            raise ValueError(f"Unknown simulation setting {key!r}")
+
+
+def _wave(period, amplitude, phase=0.0):
+    return amplitude * math.sin(2 * math.pi * time.time() / period + phase)
+
+
+class _Climate:
+    # Shared HTU21D stand-in: a slow daily swing plus a little noise
+    def __init__(self, cache_seconds=2.0):
+        self.cache_seconds = cache_seconds
+        self._lock = threading.Lock()
+        self._reading = None
+
+    def read(self):
+        with self._lock:
+            now = time.time()
+            if self._reading is None or now - self._reading[2] >= (self.cache_seconds or 0):
+                FAULTS["climate"].call("HTU21D read")
+                noise = FAULTS["climate"].random.gauss
+                celsius = 24.0 + _wave(86400, 3.0) + noise(0, 0.1)
+                rh = 60.0 - _wave(86400, 8.0) + noise(0, 0.5)
+                self._reading = (round(celsius, 2), round(min(max(rh, 0.0), 100.0), 2), now)
+            return self._reading[:2]
+
+
+_climate = {}
+_climate_lock = threading.Lock()
+
+
+def _shared_climate(cache_seconds, bus):
+    with _climate_lock:
+        if bus not in _climate:
+            _climate[bus] = _Climate(2.0 if cache_seconds is None else cache_seconds)
+        return _climate[bus]
+
+
+class TemperatureSensor:
+    def __init__(self, cache_seconds=None, bus=None):
+        self.climate = _shared_climate(cache_seconds, bus)
+
+    def read_temp(self):
+        temperature, _ = self.climate.read()
+        return temperature * (9 / 5) + 32
+
+
+class RHMeter:
+    def __init__(self, cache_seconds=None, bus=None):
+        self.climate = _shared_climate(cache_seconds, bus)
+
+    def read_rh(self):
+        _, rh_value = self.climate.read()
+        return rh_value
+
+
+class WaterTemperatureSensor:
+    # Like the real driver, readings are "converted" up front so reads
+    # never block; failures still surface on read.
+    def __init__(self, probes=None, resolution=None, interval=5.0):
+        self.probes = list(probes or {"reservoir": ""})
+        self.resolution = resolution
+        self.interval = interval
+        self.primary = self.probes[0]
+
+    def read_all(self):
+        FAULTS["water_temperature"].call("DS18B20 read")
+        noise = FAULTS["water_temperature"].random.gauss
+        return {
+            name: round(68.0 + index * 1.5 + _wave(86400, 1.5) + noise(0, 0.05), 2)
+            for index, name in enumerate(self.probes)
+        }
+
+    def read_temp(self):
+        return self.read_all()[self.primary]
+
+    def close(self):
+        pass
+
+
+class PHMeter:
+    # Produces a drifting reservoir pH through the configured calibration,
+    # with per-sample ADC noise so the filtering path is exercised.
+    def __init__(self, pin, slope=-5.6548, intercept=15.509, cal_type="linear", a=0, b=0, c=0, sampling=None):
+        self.pin = pin
+        self.set_calibration(slope, intercept, cal_type, a, b, c)
+        self.configure_sampling(**(sampling or {}))
+
+    def set_calibration(self, slope=-5.6548, intercept=15.509, cal_type="linear", a=0, b=0, c=0):
+        self.slope = slope
+        self.intercept = intercept
+        self.cal_type = cal_type
+        self.a = a
+        self.b = b
+        self.c = c
+
+    def configure_sampling(self, samples=1, filter="median", trim=0.1, outlier_sigma=3.0):
+        self.samples = max(1, int(samples))
+        self.filter = filter
+        self.trim = trim
+        self.outlier_sigma = outlier_sigma
+        self.last_noise = None
+
+    def voltage_to_ph(self, voltage):
+        if self.cal_type == "quadratic":
+            return self.a * voltage ** 2 + self.b * voltage + self.c
+        return self.slope * voltage + self.intercept
+
+    def read_voltages(self, n):
+        fault = FAULTS["ph"]
+        time.sleep(fault.delay() * n)
+        fault.check("MCP3008 read")
+        target_ph = 6.0 + _wave(3 * 86400, 0.4)
+        return [(target_ph - self.intercept) / self.slope + fault.random.gauss(0, 0.002) for _ in range(n)]
+
+    def read_voltage(self):
+        return self.read_voltages(1)[0]
+
+    def read_filtered_voltage(self):
+        # Median of the configured burst, the real meter's default filter
+        volts = sorted(self.read_voltages(self.samples))
+        return volts[len(volts) // 2]
+
+    def read_ph_sample(self):
+        ph_value = self.voltage_to_ph(self.read_filtered_voltage())
+        self.last_noise = None if self.samples == 1 else round(abs(self.slope) * 0.002, 4)
+        return ph_value, self.last_noise
+
+    def read_ph(self):
+        return self.read_ph_sample()[0]
@@ -1,15 +1,11 @@
-import board
-from adafruit_htu21d import HTU21D
-import time
+from meters.climate import shared_sensor
 
 class TemperatureSensor:
-    def __init__(self):
-        # Create sensor object, communicating over the board's default I2C bus
-        i2c = board.I2C()  # uses board.SCL and board.SDA
-        # i2c = board.STEMMA_I2C()  # For using the built-in STEMMA QT connector on a microcontroller
-        self.sensor = HTU21D(i2c)
+    def __init__(self, cache_seconds=None, bus=None):
+        # Shares one HTU21D (and its I2C bus object) with RHMeter
+        self.climate = shared_sensor(cache_seconds, bus)
 
     def read_temp(self):
-        temperature = self.sensor.temperature
+        temperature, _ = self.climate.read()
         farenheit = temperature * (9 / 5) + 32
         return farenheit
@@ -1,11 +1,90 @@
 from w1thermsensor import W1ThermSensor
+import threading
+import time
+
+# Worst-case DS18B20 conversion time per resolution (bits -> seconds)
+CONVERSION_SECONDS = {9: 0.094, 10: 0.188, 11: 0.375, 12: 0.75}
 
 class WaterTemperatureSensor:
-    def __init__(self):
-        self.sensor = W1ThermSensor()  # Uses the first detected sensor
+    # Reads one or more DS18B20 probes on the 1-Wire bus from a background
+    # thread; read_temp()/read_all() return the latest completed conversion
+    # immediately instead of blocking for up to 750 ms.
+    #
+    # probes: {"reservoir": "<sensor id>", "runoff": "<sensor id>", ...}
+    #   An empty id (or no probes at all) picks the first detected sensor.
+    #   The first probe is the one reported by read_temp().
+    # resolution: 9-12 bits; lower is faster but coarser. Setting it needs
+    #   root, so it may be left as the probes have it (None: don't touch)
+    # interval: seconds between conversion passes
+    def __init__(self, probes=None, resolution=None, interval=5.0):
+        self.interval = interval
+        self.sensors = {}
+        for name, sensor_id in (probes or {"reservoir": ""}).items():
+            self.sensors[name] = W1ThermSensor(sensor_id=sensor_id) if sensor_id else W1ThermSensor()
+        if resolution is not None:
+            for name, sensor in self.sensors.items():
+                try:
+                    sensor.set_resolution(int(resolution))
+                except Exception as e:
+                    # Writing the resolution needs root; the probe keeps its own
+                    print(f"Water temperature probe {name}: could not set {resolution}-bit resolution: {e}")
+        # Bulk conversions wait for the slowest probe's actual resolution
+        resolutions = []
+        for sensor in self.sensors.values():
+            try:
+                resolutions.append(sensor.get_resolution())
+            except Exception:
+                resolutions.append(None)
+        self.resolution = None if None in resolutions else max(resolutions)
+        self.primary = next(iter(self.sensors))
+        self._bulk_trigger = W1ThermSensor.BASE_DIRECTORY / "w1_bus_master1" / "therm_bulk_read"
+        self._readings = {}
+        self._error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="wtemp-conversions", daemon=True)
+        self._thread.start()
+
+    def _convert_all(self):
+        # Start a conversion on every probe at once when the kernel supports
+        # bulk reads, otherwise convert them one after another.
+        if self._bulk_trigger.exists():
+            self._bulk_trigger.write_text("trigger\n")
+            time.sleep(CONVERSION_SECONDS.get(self.resolution, 0.75))
+            celsius = {}
+            for name, sensor in self.sensors.items():
+                millidegrees = (sensor.sensorpath.parent / "temperature").read_text().strip()
+                celsius[name] = int(millidegrees) / 1000.0
+            return celsius
+        return {name: sensor.get_temperature() for name, sensor in self.sensors.items()}
+
+    def close(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                celsius = self._convert_all()
+                now = time.time()
+                with self._lock:
+                    for name, value in celsius.items():
+                        self._readings[name] = (round(value * 9 / 5 + 32, 2), now)
+                    self._error = None
+            except Exception as e:
+                with self._lock:
+                    self._error = str(e)
+            self._stop.wait(self.interval)
+
+    def read_all(self):
+        # Latest temperature of every probe in Fahrenheit
+        with self._lock:
+            if not self._readings:
+                raise RuntimeError(self._error or "No conversion completed yet")
+            newest = max(timestamp for _, timestamp in self._readings.values())
+            if self._error and time.time() - newest > max(60, 3 * self.interval):
+                raise RuntimeError(self._error)
+            return {name: value for name, (value, _) in self._readings.items()}
 
     def read_temp(self):
         # Returns temperature in Fahrenheit
-        celsius = self.sensor.get_temperature()
-        fahrenheit = celsius * 9 / 5 + 32
-        return round(fahrenheit, 2)
+        return self.read_all()[self.primary]
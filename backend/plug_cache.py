@@ -0,0 +1,100 @@
+import threading
+import time
+
+
+class PlugStateCache:
+    # Last known on/off state of every plug in a zone, with when it was last
+    # confirmed. Polls and the controller's own commands write to it
+    # (set()); reads never touch the network. A plug that doesn't answer is
+    # skipped by due() for retry_base seconds, doubling after every failure
+    # up to retry_max, and keeps reporting its last known state meanwhile.
+
+    def __init__(self, retry_base=15.0, retry_max=300.0):
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._entries = {}  # name -> {"on", "updated", "changed", "source", "recorded", "failures", "error", "retry_at"}
+        self._lock = threading.Lock()
+
+    def set(self, name, is_on, source):
+        # Returns the previous state (None if unknown)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.setdefault(name, {"on": None, "changed": None, "recorded": None, "error": None})
+            previous = entry["on"]
+            if previous != is_on or entry["error"] is not None:
+                entry["changed"] = now
+            entry.update(on=is_on, updated=now, source=source, failures=0, error=None, retry_at=None)
+            return previous
+
+    def failed(self, name, error):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.setdefault(name, {"on": None, "updated": None, "changed": None, "source": None,
+                                                    "recorded": None, "failures": 0, "error": None})
+            if entry["error"] != error:
+                entry["changed"] = now
+            entry["failures"] += 1
+            entry["error"] = error
+            entry["retry_at"] = now + min(self.retry_base * 2 ** (entry["failures"] - 1), self.retry_max)
+
+    def mark_recorded(self, name, recorded_at):
+        with self._lock:
+            if name in self._entries:
+                self._entries[name]["recorded"] = recorded_at
+
+    def state(self, name, max_age=None):
+        # Last known state, or None if unknown or older than max_age seconds
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry["updated"] is None:
+                return None
+            if max_age is not None and time.time() - entry["updated"] > max_age:
+                return None
+            return entry["on"]
+
+    def entry(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            return dict(entry) if entry else None
+
+    def due(self, names, max_age):
+        # The plugs worth polling now: state older than max_age and not backing off
+        now = time.time()
+        with self._lock:
+            result = []
+            for name in names:
+                entry = self._entries.get(name)
+                if entry is None:
+                    result.append(name)
+                elif entry.get("retry_at") is not None:
+                    if now >= entry["retry_at"]:
+                        result.append(name)
+                elif entry["updated"] is None or now - entry["updated"] >= max_age:
+                    result.append(name)
+            return result
+
+    def info(self, names, confirmed=False):
+        # {name: {"on", "changed_at", "source", "error", "retry_at"}} for
+        # /api/status and the live stream. Times are Unix timestamps; clients
+        # work out ages. changed_at moves only when the on/off or error state
+        # does, so stream deltas leave unchanged plugs out. `confirmed` adds
+        # "updated_at", the last successful poll or command, which changes
+        # on every refresh.
+        result = {}
+        with self._lock:
+            for name in names:
+                entry = self._entries.get(name) or {}
+                result[name] = {
+                    "on": entry.get("on"),
+                    "changed_at": entry.get("changed"),
+                    "source": entry.get("source"),
+                    "error": entry.get("error"),
+                    "retry_at": entry.get("retry_at")
+                }
+                if confirmed:
+                    result[name]["updated_at"] = entry.get("updated")
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
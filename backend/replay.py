@@ -0,0 +1,285 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import sqlite3
+import time
+
+import control
+import derived
+from derived import svp
+from sampler import Reading
+from scheduler import DailyTrigger, IntervalTrigger, ThresholdWatch
+
+# Accelerated-time replay of the climate and light controller.
+#
+# Feeds sensor readings through control.decide() -- the same function the
+# live controller calls -- on a virtual clock, and reports how often each
+# plug switched, its duty cycle and how long the room spent out of range.
+#
+# Readings come from one of two sources:
+#
+#   - a simulated room (default): a lumped thermal/moisture model that reacts
+#     to the plugs, so changes to Ideal Ranges or the control logic show
+#     their effect on the climate
+#   - a recorded history.db (--history): the stored temperature and humidity
+#     are replayed as-is; the plugs don't influence them
+#
+# Control runs on the same triggers as the live scheduler: every
+# CLIMATE_INTERVAL, at the light on/off times, and whenever a reading leaves
+# or re-enters its range (with the same deadband and at most one such run
+# per EVENT_MIN_GAP).
+#
+# Usage: python replay.py [--days 30] [--config data.json] [--stage NAME]
+#                         [--devices Fan,Humidifier,Light,Heater,Dehumidifier]
+#                         [--room room.json] [--history history.db] [--json]
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Match the live scheduler
+CLIMATE_INTERVAL = 5 * 60
+THRESHOLD_DEADBAND = 0.1
+EVENT_MIN_GAP = 60
+SAMPLE_INTERVAL = 10  # Seconds between simulated sensor samples
+
+
+class RoomModel:
+    # Air temperature and vapour pressure relax toward the ambient (outside
+    # the tent) values; plugs add or remove heat and moisture. Rates are per
+    # minute, time constants in minutes.
+    def __init__(self, ambient_c=20.0, ambient_swing_c=4.0, ambient_rh=50.0, leak_minutes=60.0,
+                 fan_minutes=20.0, heater_c=0.1, light_c=0.08, humidifier_kpa=0.04,
+                 dehumidifier_kpa=0.03, transpiration_kpa=0.01, sensor_noise_c=0.1,
+                 sensor_noise_rh=0.5, seed=0):
+        self.ambient_c = ambient_c
+        self.ambient_swing_c = ambient_swing_c
+        self.ambient_rh = ambient_rh
+        self.leak_minutes = leak_minutes
+        self.fan_minutes = fan_minutes
+        self.heater_c = heater_c
+        self.light_c = light_c
+        self.humidifier_kpa = humidifier_kpa
+        self.dehumidifier_kpa = dehumidifier_kpa
+        self.transpiration_kpa = transpiration_kpa
+        self.sensor_noise_c = sensor_noise_c
+        self.sensor_noise_rh = sensor_noise_rh
+        self.random = random.Random(seed)
+        self.temp_c = ambient_c
+        self.vapour_kpa = svp(ambient_c) * ambient_rh / 100
+
+    def ambient(self, t):
+        # Coldest around 05:00, warmest around 17:00
+        local = datetime.datetime.fromtimestamp(t)
+        hour = local.hour + local.minute / 60
+        temp_c = self.ambient_c - self.ambient_swing_c * math.cos(2 * math.pi * (hour - 5) / 24)
+        return temp_c, svp(temp_c) * self.ambient_rh / 100
+
+    def step(self, t, seconds, plugs):
+        minutes = seconds / 60
+        ambient_c, ambient_kpa = self.ambient(t)
+        exchange = 1 / self.leak_minutes + (1 / self.fan_minutes if plugs.get("Fan") else 0)
+        light = 1 if plugs.get("Light") else 0
+        d_temp = (ambient_c - self.temp_c) * exchange
+        d_temp += self.heater_c * bool(plugs.get("Heater")) + self.light_c * light
+        d_vapour = (ambient_kpa - self.vapour_kpa) * exchange
+        d_vapour += self.humidifier_kpa * bool(plugs.get("Humidifier")) + self.transpiration_kpa * light
+        d_vapour -= self.dehumidifier_kpa * bool(plugs.get("Dehumidifier"))
+        self.temp_c += d_temp * minutes
+        self.vapour_kpa = min(max(self.vapour_kpa + d_vapour * minutes, 0.0), svp(self.temp_c))
+
+    def read(self, t):
+        # (temperature °F, RH %) as the sensors would report them
+        rh = 100 * self.vapour_kpa / svp(self.temp_c) + self.random.gauss(0, self.sensor_noise_rh)
+        temp_c = self.temp_c + self.random.gauss(0, self.sensor_noise_c)
+        return round(derived.c_to_f(temp_c), 2), round(min(max(rh, 0.0), 100.0), 2)
+
+
+class RecordedTrace:
+    # Temperature and humidity from a history.db, stepped through in order
+    def __init__(self, path):
+        db = sqlite3.connect(path)
+        rows = db.execute(
+            "SELECT ts, metric, value FROM samples WHERE metric IN ('temperature', 'humidity') ORDER BY ts"
+        ).fetchall()
+        db.close()
+        if not rows:
+            raise ValueError(f"No temperature or humidity samples in {path}")
+        self.rows = rows
+        self.start = rows[0][0]
+        self.end = rows[-1][0]
+        self._index = 0
+        self._latest = {}
+
+    def step(self, t, seconds, plugs):
+        pass
+
+    def read(self, t):
+        while self._index < len(self.rows) and self.rows[self._index][0] <= t:
+            _, metric, value = self.rows[self._index]
+            self._latest[metric] = value
+            self._index += 1
+        return self._latest.get("temperature"), self._latest.get("humidity")
+
+
+class _Triggers:
+    # Stands in for the scheduler so ThresholdWatch can request a control run
+    def __init__(self):
+        self.pending = None
+
+    def trigger(self, name, reason=None):
+        self.pending = reason or "event"
+
+
+def humidity_in_range(data, temp_f, rh):
+    units = data.get("Units", {})
+    ideal = data["Ideal Ranges"][data["State"]["Current Stage"]]
+    if units.get("Humidity Metric", "RH") == "VPD":
+        bounds = ideal.get("VPD", {"min": 0.8, "max": 1.2})
+        value = control.calculate_vpd(control.to_celsius(temp_f), rh)
+    else:
+        bounds = ideal.get("Relative Humidity", {"min": 40, "max": 60})
+        value = rh
+    return bounds["min"] <= value <= bounds["max"]
+
+
+def replay(data, source, start, seconds, step=SAMPLE_INTERVAL):
+    devices = list(data["Kasa configs"]["Device_IPs"])
+    plugs = {}
+    switches = {name: 0 for name in devices}
+    on_seconds = {name: 0.0 for name in devices}
+    out_of_range = {"temperature": 0.0, "humidity": 0.0}
+    temps, rhs = [], []
+    runs = {}
+    triggers = _Triggers()
+    watch = ThresholdWatch(triggers, "climate_control", ["temperature", "humidity"],
+                           lambda name: control.sensor_range(data, name), THRESHOLD_DEADBAND)
+    interval = IntervalTrigger(CLIMATE_INTERVAL)
+    daily = DailyTrigger([data.get("Light Schedule", {}).get("on", "06:00"), data.get("Light Schedule", {}).get("off", "22:00")])
+    next_run = start
+    last_run = None
+    temp_range = control.sensor_range(data, "temperature")
+
+    t = start
+    end = start + seconds
+    while t < end:
+        temp_f, rh = source.read(t)
+        if temp_f is not None and rh is not None:
+            watch("temperature", Reading(temp_f, t))
+            watch("humidity", Reading(rh, t))
+            temps.append(temp_f)
+            rhs.append(rh)
+            if temp_range and not temp_range[0] <= temp_f <= temp_range[1]:
+                out_of_range["temperature"] += step
+            if not humidity_in_range(data, temp_f, rh):
+                out_of_range["humidity"] += step
+
+            event_due = triggers.pending and (last_run is None or t - last_run >= EVENT_MIN_GAP)
+            if t >= next_run or event_due:
+                reason = "threshold" if event_due else "schedule"
+                triggers.pending = None
+                last_run = t
+                runs[reason] = runs.get(reason, 0) + 1
+                desired, _ = control.decide(data, temp_f, rh, datetime.datetime.fromtimestamp(t))
+                if desired is None:
+                    raise ValueError("Invalid temperature range configuration")
+                for name, on in desired.items():
+                    if plugs.get(name) != on:
+                        if name in plugs:
+                            switches[name] += 1
+                        plugs[name] = on
+                next_run = min(interval.next_after(t), daily.next_after(t))
+
+        for name in devices:
+            if plugs.get(name):
+                on_seconds[name] += step
+        source.step(t, step, plugs)
+        t += step
+
+    elapsed = t - start
+    return {
+        "days": round(elapsed / 86400, 2),
+        "control_runs": runs,
+        "devices": {
+            name: {"switches": switches[name], "duty_cycle": round(on_seconds[name] / elapsed, 4)}
+            for name in devices
+        },
+        "out_of_range_hours": {name: round(value / 3600, 2) for name, value in out_of_range.items()},
+        "out_of_range_fraction": {name: round(value / elapsed, 4) for name, value in out_of_range.items()},
+        "temperature_f": _stats(temps),
+        "humidity_rh": _stats(rhs)
+    }
+
+
+def _stats(values):
+    if not values:
+        return None
+    return {"min": round(min(values), 2), "mean": round(sum(values) / len(values), 2), "max": round(max(values), 2)}
+
+
+def load_config(path, stage=None, devices=None):
+    if path is None:
+        path = os.path.join(BACKEND_DIR, "data.json")
+        if not os.path.exists(path):
+            path = os.path.join(BACKEND_DIR, "data.json.example")
+    with open(path) as f:
+        data = json.load(f)
+    if stage:
+        if stage not in data["Ideal Ranges"]:
+            raise ValueError(f"Unknown stage {stage!r}, expected one of {list(data['Ideal Ranges'])}")
+        data["State"]["Current Stage"] = stage
+    if devices:
+        # Only the names matter; no plug is contacted
+        data["Kasa configs"]["Device_IPs"] = {name: f"replay-{name.lower()}" for name in devices}
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the climate controller on a virtual clock")
+    parser.add_argument("--days", type=float, default=30, help="length of the simulated grow")
+    parser.add_argument("--config", help="data.json to use (default: backend/data.json)")
+    parser.add_argument("--stage", help="override the current stage")
+    parser.add_argument("--devices", help="comma-separated plugs to simulate (default: Device_IPs)")
+    parser.add_argument("--room", help="JSON file of RoomModel parameters")
+    parser.add_argument("--history", help="replay readings recorded in this history.db instead of simulating")
+    parser.add_argument("--step", type=float, help="seconds between sensor samples (default: the climate sampling interval)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    data = load_config(args.config, args.stage, args.devices.split(",") if args.devices else None)
+    if args.history:
+        source = RecordedTrace(args.history)
+        start = source.start
+        seconds = min(args.days * 86400, source.end - source.start)
+    else:
+        room = {}
+        if args.room:
+            with open(args.room) as f:
+                room = json.load(f)
+        source = RoomModel(**room)
+        # Start at local midnight so runs are comparable
+        start = datetime.datetime.combine(datetime.date.today(), datetime.time()).timestamp()
+        seconds = args.days * 86400
+
+    step = args.step or data.get("Sampling Intervals", {}).get("climate", SAMPLE_INTERVAL)
+    started = time.perf_counter()
+    results = replay(data, source, start, seconds, step)
+    results["wall_seconds"] = round(time.perf_counter() - started, 2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Replayed {results['days']} days of '{data['State']['Current Stage']}' in {results['wall_seconds']} s "
+          f"({sum(results['control_runs'].values())} control runs)")
+    print(f"{'device':<14}{'switches':>10}{'duty cycle':>12}")
+    for name, device in results["devices"].items():
+        print(f"{name:<14}{device['switches']:>10}{device['duty_cycle'] * 100:>11.1f}%")
+    for name, hours in results["out_of_range_hours"].items():
+        print(f"{name} out of range: {hours} h ({results['out_of_range_fraction'][name] * 100:.1f}%)")
+    print(f"temperature °F: {results['temperature_f']}")
+    print(f"humidity %RH:   {results['humidity_rh']}")
+
+
+if __name__ == "__main__":
+    main()
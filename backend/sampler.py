@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+# A single sensor value and the wall-clock time it was read at
+Reading = namedtuple("Reading", ["value", "timestamp"])
+
+NO_READING = {"error": "No reading yet"}
+
+
+class Snapshot:
+    # Immutable view of the latest reading of every sensor. The sampler swaps
+    # in a new Snapshot on each publish, so readers never need a lock.
+    __slots__ = ("readings", "timestamp")
+
+    def __init__(self, readings, timestamp):
+        object.__setattr__(self, "readings", MappingProxyType(dict(readings)))
+        object.__setattr__(self, "timestamp", timestamp)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot is immutable")
+
+    def value(self, name):
+        reading = self.readings.get(name)
+        return reading.value if reading else NO_READING
+
+    def age(self, name, now=None):
+        reading = self.readings.get(name)
+        if reading is None:
+            return None
+        now = time.time() if now is None else now
+        return round(max(0.0, now - reading.timestamp), 1)
+
+    def ages(self, now=None):
+        now = time.time() if now is None else now
+        return {name: self.age(name, now) for name in self.readings}
+
+
+class SensorSampler:
+    # Reads each registered sensor on its own interval from one background
+    # thread and publishes the results as a Snapshot.
+
+    def __init__(self):
+        self._sources = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._ready = threading.Event()
+        self._snapshot = Snapshot({}, 0)
+        self._listeners = []
+        self._thread = None
+
+    def add(self, name, read, interval):
+        # `read` is a zero-argument callable; it is looked up on every sample,
+        # so a closure over a module-level sensor follows re-initialization.
+        self.add_group((name,), lambda: {name: read()}, interval)
+
+    def add_group(self, names, read, interval):
+        # For drivers that produce several values per measurement: `read`
+        # returns {name: value} and all of them are published together.
+        with self._lock:
+            self._sources[tuple(names)] = {"read": read, "interval": float(interval), "due": 0.0}
+        self._wake.set()
+
+    def set_interval(self, name, interval):
+        # A shorter interval takes effect now, not after the old one runs out
+        with self._lock:
+            for names, src in self._sources.items():
+                if name in names:
+                    src["interval"] = float(interval)
+                    src["due"] = min(src["due"], time.monotonic() + src["interval"])
+        self._wake.set()
+
+    def refresh(self, *names):
+        # Force the named sensors (or all of them) to be read on the next pass
+        with self._lock:
+            for key, src in self._sources.items():
+                if not names or any(name in key for name in names):
+                    src["due"] = 0.0
+        self._wake.set()
+
+    def subscribe(self, callback):
+        # `callback(name, reading)` runs on the sampler thread after each publish
+        self._listeners.append(callback)
+
+    def snapshot(self):
+        return self._snapshot
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sensor-sampler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                due = [(names, src) for names, src in self._sources.items() if src["due"] <= now]
+            for names, src in due:
+                try:
+                    values = src["read"]()
+                except Exception as e:
+                    values = {name: {"error": f"Read failed: {e}"} for name in names}
+                self._publish(values)
+                src["due"] = time.monotonic() + src["interval"]
+            if self._sources and not self._ready.is_set():
+                self._ready.set()
+            with self._lock:
+                next_due = min((src["due"] for src in self._sources.values()), default=now + 1.0)
+            self._wake.wait(max(0.0, next_due - time.monotonic()))
+            self._wake.clear()
+
+    def _publish(self, values):
+        now = time.time()
+        published = {name: Reading(value, now) for name, value in values.items()}
+        readings = dict(self._snapshot.readings)
+        readings.update(published)
+        self._snapshot = Snapshot(readings, now)
+        for name, reading in published.items():
+            for callback in self._listeners:
+                try:
+                    callback(name, reading)
+                except Exception as e:
+                    print(f"Sampler listener error: {e}")
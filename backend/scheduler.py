@@ -0,0 +1,225 @@
+import datetime
+import functools
+import random
+import threading
+import time
+
+
+class IntervalTrigger:
+    # Fires every `seconds`, plus up to `jitter` seconds of random delay
+    def __init__(self, seconds, jitter=0):
+        self.seconds = seconds
+        self.jitter = jitter
+
+    def next_after(self, now):
+        return now + self.seconds + random.uniform(0, self.jitter)
+
+    def describe(self):
+        return f"every {self.seconds}s"
+
+
+@functools.lru_cache(maxsize=64)
+def parse_hhmm(value):
+    # strptime is slow enough to dominate replays; schedules rarely change
+    return datetime.datetime.strptime(value, "%H:%M").time()
+
+
+class DailyTrigger:
+    # Fires at wall-clock "HH:MM" times. `times` may be a list or a callable
+    # returning one, so edits to the config apply on the next computation.
+    def __init__(self, times):
+        self.times = times
+
+    def _times(self):
+        return self.times() if callable(self.times) else self.times
+
+    def next_after(self, now):
+        current = datetime.datetime.fromtimestamp(now)
+        best = None
+        for hhmm in self._times():
+            try:
+                at = parse_hhmm(hhmm)
+            except (TypeError, ValueError):
+                continue
+            candidate = datetime.datetime.combine(current.date(), at)
+            if candidate.timestamp() <= now:
+                candidate += datetime.timedelta(days=1)
+            if best is None or candidate < best:
+                best = candidate
+        return best.timestamp() if best else None
+
+    def describe(self):
+        return "daily at " + ", ".join(self._times())
+
+
+class Job:
+    def __init__(self, name, func, triggers, min_event_gap=0):
+        self.name = name
+        self.func = func
+        self.triggers = triggers
+        self.min_event_gap = min_event_gap
+        self.next_run = None
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+        self.run_count = 0
+        self.skipped = 0
+        self.running = False
+        self.pending_event = None
+        self.last_reason = None
+
+    def event_time(self, now):
+        # Earliest an event-triggered run may start: min_event_gap after the last run
+        if self.last_run is None:
+            return now
+        return max(now, self.last_run + self.min_event_gap)
+
+    def schedule(self, now):
+        times = [t for t in (trigger.next_after(now) for trigger in self.triggers) if t is not None]
+        self.next_run = min(times) if times else None
+
+    def info(self):
+        return {
+            "name": self.name,
+            "triggers": [trigger.describe() for trigger in self.triggers],
+            "next_run": self.next_run,
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+            "last_reason": self.last_reason,
+            "run_count": self.run_count,
+            "skipped": self.skipped,
+            "running": self.running
+        }
+
+
+class Scheduler:
+    # Runs jobs on interval, wall-clock and event triggers from one
+    # dispatcher thread. Each run gets its own worker thread so a slow job
+    # can't delay the others, and a job that is still running is never
+    # started a second time. Event-triggered runs start at most once per
+    # job's min_event_gap seconds.
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, func, *triggers, run_at_start=True, min_event_gap=0):
+        job = Job(name, func, list(triggers), min_event_gap)
+        now = time.time()
+        if run_at_start:
+            job.next_run = now
+        else:
+            job.schedule(now)
+        with self._lock:
+            self._jobs[name] = job
+        self._wake.set()
+        return job
+
+    def trigger(self, name, reason=None):
+        # Run a job as soon as its min_event_gap allows, e.g. when a reading
+        # crosses a threshold. Triggers that arrive while the job is running
+        # or waiting out the gap are coalesced into one run.
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is None:
+                return
+            if job.pending_event is not None:
+                job.skipped += 1
+            if not job.running:
+                at = job.event_time(time.time())
+                job.next_run = at if job.next_run is None else min(job.next_run, at)
+            job.pending_event = reason or "event"
+        self._wake.set()
+
+    def reschedule(self, name):
+        # Recompute the next run, e.g. after the light schedule changes. A
+        # pending event-triggered run keeps its (earlier) time.
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is not None and not job.running:
+                event_run = job.next_run if job.pending_event is not None else None
+                job.schedule(time.time())
+                if event_run is not None:
+                    job.next_run = event_run if job.next_run is None else min(job.next_run, event_run)
+        self._wake.set()
+
+    def jobs(self):
+        with self._lock:
+            return [job.info() for job in self._jobs.values()]
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            now = time.time()
+            with self._lock:
+                due = [job for job in self._jobs.values() if job.next_run is not None and job.next_run <= now]
+                for job in due:
+                    job.running = True
+                    job.next_run = None
+                    job.last_reason = job.pending_event or "schedule"
+                    job.pending_event = None
+                    threading.Thread(target=self._execute, args=(job,), name=f"job-{job.name}", daemon=True).start()
+                upcoming = [job.next_run for job in self._jobs.values() if job.next_run is not None]
+            timeout = max(0.0, min(upcoming) - time.time()) if upcoming else None
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def _execute(self, job):
+        started = time.time()
+        error = None
+        try:
+            job.func()
+        except Exception as e:
+            error = str(e)
+            print(f"Scheduled job {job.name} failed: {e}")
+        finished = time.time()
+        with self._lock:
+            job.last_run = started
+            job.last_duration = round(finished - started, 3)
+            job.last_error = error
+            job.run_count += 1
+            job.running = False
+            if job.pending_event is not None:
+                job.next_run = job.event_time(finished)
+            else:
+                job.schedule(finished)
+        self._wake.set()
+
+
+class ThresholdWatch:
+    # Sampler listener that fires a scheduler job whenever a reading moves
+    # into or out of its range. `get_range(name)` returns (min, max) or None.
+    # A reading that left the range only counts as back in once it is inside
+    # by `deadband` (a fraction of the range width), so noise around a bound
+    # doesn't fire on every sample.
+
+    def __init__(self, scheduler, job_name, metrics, get_range, deadband=0.1):
+        self.scheduler = scheduler
+        self.job_name = job_name
+        self.metrics = metrics
+        self.get_range = get_range
+        self.deadband = deadband
+        self._in_range = {}
+
+    def __call__(self, name, reading):
+        if name not in self.metrics or not isinstance(reading.value, (int, float)):
+            return
+        bounds = self.get_range(name)
+        if bounds is None:
+            return
+        previous = self._in_range.get(name)
+        low, high = bounds
+        if previous is False:
+            margin = (high - low) * self.deadband
+            low, high = low + margin, high - margin
+        in_range = low <= reading.value <= high
+        self._in_range[name] = in_range
+        if previous is not None and previous != in_range:
+            self.scheduler.trigger(self.job_name, f"{name} {'back in' if in_range else 'out of'} range")
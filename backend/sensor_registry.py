@@ -0,0 +1,97 @@
+import threading
+import time
+
+
+class SensorRegistry:
+    # The sensor drivers of one zone. configure() takes a spec per sensor,
+    # a (wiring, settings) pair built from the config: a driver is rebuilt
+    # only when its wiring changes, and new settings are handed to the
+    # running driver through `update`. Drivers are built on first use by
+    # get(); one that fails to build is retried after retry_base seconds,
+    # doubling after every failure up to retry_max.
+
+    def __init__(self, build, update, retry_base=5.0, retry_max=300.0):
+        self.build = build  # build(name, wiring, settings) -> driver, raises on failure
+        self.update = update  # update(name, driver, settings)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._specs = {}
+        self._drivers = {}
+        self._failures = {}  # name -> {"count", "error", "retry_at"}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _name_lock(self, name):
+        # Builds can be slow (bus scans, 1-Wire discovery); a lock per
+        # sensor keeps one slow driver from stalling the others
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _drop(self, name):
+        driver = self._drivers.pop(name, None)
+        self._failures.pop(name, None)
+        if driver is not None and hasattr(driver, "close"):
+            driver.close()
+
+    def configure(self, specs):
+        # Returns the names of the sensors whose spec changed
+        changed = []
+        for name in set(self._specs) | set(specs):
+            with self._name_lock(name):
+                old = self._specs.get(name)
+                new = specs.get(name)
+                if old == new:
+                    continue
+                changed.append(name)
+                driver = self._drivers.get(name)
+                if old is None or new is None or old[0] != new[0]:
+                    self._drop(name)
+                elif driver is not None:
+                    try:
+                        self.update(name, driver, new[1])
+                    except Exception as e:
+                        print(f"Rebuilding {name} sensor, settings update failed: {e}")
+                        self._drop(name)
+                if new is None:
+                    self._specs.pop(name, None)
+                else:
+                    self._specs[name] = new
+        return sorted(changed)
+
+    def get(self, name):
+        # Returns (driver, error), building the driver if it is due
+        with self._name_lock(name):
+            driver = self._drivers.get(name)
+            if driver is not None:
+                return driver, None
+            spec = self._specs.get(name)
+            if spec is None:
+                return None, f"No {name} sensor configured"
+            failure = self._failures.get(name)
+            now = time.monotonic()
+            if failure and now < failure["retry_at"]:
+                return None, failure["error"]
+            try:
+                driver = self.build(name, *spec)
+            except Exception as e:
+                count = failure["count"] + 1 if failure else 1
+                delay = min(self.retry_base * 2 ** (count - 1), self.retry_max)
+                self._failures[name] = {"count": count, "error": str(e), "retry_at": now + delay}
+                return None, str(e)
+            self._failures.pop(name, None)
+            self._drivers[name] = driver
+            return driver, None
+
+    def info(self):
+        # Per-sensor state for /api/sensors
+        now = time.monotonic()
+        result = {}
+        for name in sorted(self._specs):
+            failure = self._failures.get(name)
+            result[name] = {
+                "ready": name in self._drivers,
+                "error": failure["error"] if failure else None,
+                "failures": failure["count"] if failure else 0,
+                "retry_in": round(max(0.0, failure["retry_at"] - now), 1) if failure else None
+            }
+        return result
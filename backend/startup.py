@@ -0,0 +1,87 @@
+import threading
+import time
+
+
+class Startup:
+    # Timeline of the backend's startup. Foreground phases are closed with
+    # mark() as module-level setup progresses; background phases (hardware,
+    # plugs, threads) run on their own thread after the HTTP server can
+    # already answer. The service is ready once every background phase has
+    # finished without raising.
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+        self._last = self.started
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._failed = False
+        self._ready_at = None
+
+    def mark(self, name):
+        # Records a foreground phase that ran since the previous mark
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append({"name": name, "background": False, "state": "done",
+                                "start": self._last - self.started, "seconds": now - self._last})
+            self._last = now
+
+    def run_background(self, steps):
+        # steps: [(name, func)], run in order on a daemon thread
+        with self._lock:
+            pending = [{"name": name, "background": True, "state": "pending", "start": None, "seconds": None}
+                       for name, _ in steps]
+            self.phases.extend(pending)
+
+        def run():
+            for phase, (_, func) in zip(pending, steps):
+                started = time.perf_counter()
+                phase.update(state="running", start=started - self.started)
+                try:
+                    detail = func()
+                except Exception as e:
+                    phase.update(state="failed", error=str(e))
+                    self._failed = True
+                else:
+                    phase["state"] = "done"
+                    if detail:
+                        phase["detail"] = detail
+                phase["seconds"] = time.perf_counter() - started
+            self._ready_at = time.perf_counter() - self.started
+            self._done.set()
+            print(self.format_report())
+
+        threading.Thread(target=run, name="startup", daemon=True).start()
+
+    def ready(self):
+        return self._done.is_set() and not self._failed
+
+    def wait(self, timeout=None):
+        # True once the background phases have finished (even if one failed)
+        return self._done.wait(timeout)
+
+    def report(self):
+        with self._lock:
+            phases = [dict(phase) for phase in self.phases]
+        for phase in phases:
+            for key in ("start", "seconds"):
+                if phase[key] is not None:
+                    phase[key] = round(phase[key], 3)
+        return {
+            "ready": self.ready(),
+            "finished": self._done.is_set(),
+            "ready_seconds": round(self._ready_at, 3) if self._ready_at is not None else None,
+            "uptime_seconds": round(time.perf_counter() - self.started, 3),
+            "phases": phases
+        }
+
+    def format_report(self):
+        report = self.report()
+        lines = [f"Startup {'complete' if report['ready'] else 'finished with errors'} in {report['ready_seconds']} s:"]
+        for phase in report["phases"]:
+            where = "background" if phase["background"] else "foreground"
+            line = f"  {phase['name']:<10} {where:<10} {phase['seconds'] * 1000:8.1f} ms  {phase['state']}"
+            if phase.get("error"):
+                line += f" ({phase['error']})"
+            lines.append(line)
+        return "\n".join(lines)
@@ -0,0 +1,72 @@
+import copy
+
+from events import Broadcaster
+from plug_cache import PlugStateCache
+from sampler import SensorSampler
+
+# A zone is one grow space (tent, room) with its own sensors, plugs, stage,
+# ranges and light schedule. The default zone uses the top-level settings of
+# data.json; every other zone lives under "Zones" and only lists the
+# settings it overrides:
+#
+#   "Zones": {
+#     "tent2": {
+#       "Sensor Pins": {"Water pH Sensor": 1},
+#       "Climate Sensor": {"i2c_bus": 3},
+#       "Water Temperature Probes": {"reservoir": "3c01d607d4ab"},
+#       "Kasa configs": {"Device_IPs": {"Fan": "192.168.1.60", "Light": "192.168.1.61"}},
+#       "State": {"Current Stage": "Flowering"}
+#     }
+#   }
+
+DEFAULT_ZONE = "main"
+
+
+def zone_names(data):
+    return [DEFAULT_ZONE] + [name for name in data.get("Zones", {}) if name != DEFAULT_ZONE]
+
+
+def zone_config(data, name):
+    # The config as one zone sees it. Dict-valued settings merge one level
+    # deep, so a zone can override Device_IPs but inherit the Kasa login.
+    if name == DEFAULT_ZONE:
+        return data
+    merged = dict(data)
+    for key, value in data["Zones"][name].items():
+        if isinstance(value, dict) and isinstance(data.get(key), dict):
+            merged[key] = {**data[key], **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+def zone_section(data, name, key):
+    # The dict to change (inside config.edit()) when editing `key` for one
+    # zone. A zone that doesn't override `key` yet starts from a copy of the
+    # top-level setting.
+    if name == DEFAULT_ZONE:
+        return data.setdefault(key, {})
+    overrides = data["Zones"][name]
+    if key not in overrides:
+        overrides[key] = copy.deepcopy(data.get(key, {}))
+    return overrides[key]
+
+
+class Zone:
+    # Runtime state of one zone: sensor drivers, the sampler, the
+    # controller's view of the plugs and the live status stream.
+
+    def __init__(self, name):
+        self.name = name
+        self.sensors = None  # SensorRegistry, attached by app.py
+        self.sampler = SensorSampler()
+        self.broadcaster = Broadcaster()
+        self.plugs = PlugStateCache()
+
+    def key(self, name):
+        # History metric, alert and metrics label for this zone. The default
+        # zone keeps bare names so existing history stays continuous.
+        return name if self.name == DEFAULT_ZONE else f"{self.name}.{name}"
+
+    def job(self, name):
+        return name if self.name == DEFAULT_ZONE else f"{name}:{self.name}"
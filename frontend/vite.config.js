@@ -1,8 +1,32 @@
 import { defineConfig } from 'vite';
 import { svelte } from '@sveltejs/vite-plugin-svelte';
+import { readFileSync, writeFileSync } from 'node:fs';
+import { join } from 'node:path';
+import { brotliCompressSync, constants, gzipSync } from 'node:zlib';
+
+// Writes .br and .gz copies next to the built files. The Flask backend
+// serves them to browsers that accept them, so nothing is compressed on the Pi.
+function precompress({ minSize = 1024 } = {}) {
+  return {
+    name: 'growpi-precompress',
+    apply: 'build',
+    writeBundle(options, bundle) {
+      for (const fileName of Object.keys(bundle)) {
+        if (!/\.(js|css|html|svg|json)$/.test(fileName)) continue;
+        const file = join(options.dir, fileName);
+        const source = readFileSync(file);
+        if (source.length < minSize) continue;
+        writeFileSync(file + '.gz', gzipSync(source, { level: 9 }));
+        writeFileSync(file + '.br', brotliCompressSync(source, {
+          params: { [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY }
+        }));
+      }
+    }
+  };
+}
 
 export default defineConfig({
-  plugins: [svelte()],
+  plugins: [svelte(), precompress()],
   server: {
     proxy: {
       // Proxy API requests to Flask backend
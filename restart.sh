@@ -17,11 +17,25 @@ echo "Restarting frontend..."
 cd ../frontend
 nohup npm run dev -- --host > ../frontend.log 2>&1 &
 
-sleep 2
+echo "Waiting for the backend to become ready..."
+# /api/ready answers 200 once sensors, plugs and background jobs are up
+backend_ready=0
+for i in $(seq 1 60); do
+    if curl -sf http://localhost:5000/api/ready >/dev/null; then
+        backend_ready=1
+        break
+    fi
+    if ! pgrep -f "python app.py" >/dev/null; then
+        break
+    fi
+    sleep 1
+done
 
 echo "Checking server status..."
-if pgrep -f "python app.py" >/dev/null; then
-    echo "Backend is running."
+if [ "$backend_ready" = 1 ]; then
+    echo "Backend is ready."
+elif pgrep -f "python app.py" >/dev/null; then
+    echo "Backend is running but not ready. See http://localhost:5000/api/ready and backend.log."
 else
     echo "Backend failed to start. Check backend.log."
 fi